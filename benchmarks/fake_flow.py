@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# A stand-in for the `flow` binary that answers check-contents, coverage,
+# autocomplete, type-at-pos and get-def with canned JSON. It reads all of
+# stdin like Flow does, and is scripted through the environment:
+#
+#   FAKE_FLOW_LATENCY_MS  how long to wait before answering (default 0)
+#   FAKE_FLOW_COUNT       errors, uncovered ranges or completions to
+#                         return (default 10)
+#   FAKE_FLOW_LINES       spread locations over this many lines
+#                         (default 1000)
+import json
+import os
+import sys
+import time
+
+
+def locations(count, lines):
+    for i in range(count):
+        line = i * lines // max(count, 1) + 1
+        yield line, (i % 40) + 1
+
+
+def check_contents(path, count, lines):
+    errors = [
+        {
+            'kind': 'infer',
+            'level': 'error',
+            'message': [
+                {
+                    'path': path, 'descr': 'number',
+                    'line': line, 'endline': line,
+                    'start': column, 'end': column + 5
+                },
+                {
+                    'path': path, 'descr': 'This type is incompatible with',
+                    'line': line, 'endline': line,
+                    'start': column + 8, 'end': column + 14
+                }
+            ]
+        }
+        for line, column in locations(count, lines)
+    ]
+    return {'passed': not errors, 'errors': errors}
+
+
+def coverage(path, count, lines):
+    uncovered = [
+        {
+            'start': {'line': line, 'column': column, 'offset': 0},
+            'end': {'line': line, 'column': column + 5, 'offset': 0}
+        }
+        for line, column in locations(count, lines)
+    ]
+    return {'expressions': {
+        'covered_count': count * 3,
+        'uncovered_count': count,
+        'uncovered_locs': uncovered
+    }}
+
+
+def autocomplete(path, count, lines):
+    return {'result': [
+        {
+            'name': 'value{}'.format(i),
+            'type': '(a: number, b: string) => void',
+            'func_details': {'params': [
+                {'name': 'a', 'type': 'number'},
+                {'name': 'b', 'type': 'string'}
+            ]} if i % 2 else None
+        }
+        for i in range(count)
+    ]}
+
+
+def type_at_pos(path, count, lines):
+    return {'type': 'number', 'path': path, 'line': 1, 'start': 1, 'end': 5}
+
+
+def get_def(path, count, lines):
+    return {'path': path, 'line': 1, 'start': 1, 'end': 5}
+
+
+RESPONSES = {
+    'check-contents': check_contents,
+    'coverage': coverage,
+    'autocomplete': autocomplete,
+    'type-at-pos': type_at_pos,
+    'get-def': get_def,
+}
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    if command not in RESPONSES:
+        sys.stderr.write('fake flow: unsupported command {}\n'.format(command))
+        return 64
+
+    sys.stdin.buffer.read()
+    time.sleep(int(os.environ.get('FAKE_FLOW_LATENCY_MS', 0)) / 1000)
+
+    path = argv[-1] if argv[-1].endswith('.js') else '/fake/file.js'
+    result = RESPONSES[command](
+        path,
+        int(os.environ.get('FAKE_FLOW_COUNT', 10)),
+        int(os.environ.get('FAKE_FLOW_LINES', 1000))
+    )
+    sys.stdout.write(json.dumps(result))
+    # Like Flow, a check with errors exits nonzero
+    return 2 if command == 'check-contents' and result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
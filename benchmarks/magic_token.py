@@ -0,0 +1,81 @@
+# Compares the old line-splitting autocomplete token injection with
+# splicing at the cursor offset, on 10k- and 100k-line buffers.
+#
+#   python benchmarks/magic_token.py
+import os
+import sys
+import timeit
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+
+from flowide.buffer import (  # noqa: E402
+    MAGIC_TOKEN,
+    buffer_snapshot,
+    insert_magic_token
+)
+
+
+LINE_COUNTS = [10000, 100000]
+RUNS = 20
+
+
+def read_buffer(contents):
+    # Stands in for view.substr(), which always returns a fresh copy
+    return (' ' + contents)[1:]
+
+
+def legacy_inject(contents, row, col):
+    current_contents = read_buffer(contents)
+    current_lines = current_contents.splitlines()
+    current_line = current_lines[row]
+    current_lines[row] = \
+        current_line[0:col] + MAGIC_TOKEN + current_line[col:-1]
+    return '\n'.join(current_lines)
+
+
+def splice_inject(contents, offset, revision):
+    current_contents = buffer_snapshot(
+        'bench', revision, lambda: read_buffer(contents)
+    )
+    return insert_magic_token(current_contents, offset)
+
+
+def make_buffer(line_count):
+    lines = ['// @flow'] + [
+        'const value{0}: number = {0};'.format(i)
+        for i in range(line_count - 1)
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def best_of(func):
+    return min(timeit.repeat(func, number=1, repeat=RUNS))
+
+
+def main():
+    print('{:>8}  {:>12}  {:>12}  {:>12}'.format(
+        'lines', 'splitlines', 'splice', 'splice+snap'
+    ))
+    for line_count in LINE_COUNTS:
+        contents = make_buffer(line_count)
+        row = line_count // 2
+        col = 6
+        offset = sum(
+            len(line) + 1 for line in contents.split('\n')[:row]
+        ) + col
+
+        revisions = iter(range(RUNS * 2))
+        legacy = best_of(lambda: legacy_inject(contents, row, col))
+        cold = best_of(
+            lambda: splice_inject(contents, offset, next(revisions))
+        )
+        warm = best_of(lambda: splice_inject(contents, offset, -1))
+
+        print('{:>8}  {:>9.2f} ms  {:>9.2f} ms  {:>9.2f} ms'.format(
+            line_count, legacy * 1000, cold * 1000, warm * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# Measures FlowIDE's own overhead for check, coverage and autocomplete
+# queries, stage by stage, against the fake flow in fake_flow.py:
+#
+#   capture    reading the buffer into a snapshot
+#   serialize  building and serializing the CLI invocation
+#   spawn      running the (fake) flow process, stdin to stdout
+#   decode     parsing Flow's JSON
+#   convert    turning results into regions or completions, like the
+#              listeners do
+#   total      the same query end to end through FlowClient
+#
+#   python benchmarks/pipeline.py [--latency-ms 0] [--runs 5]
+#                                 [--command check] [--quick]
+import argparse
+import itertools
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+
+from flowide.buffer import (  # noqa: E402
+    get_buffer_snapshot,
+    locations_to_points
+)
+from flowide.completions import CompletionSet, completion_entries  # noqa: E402
+from flowide.errors import ErrorIndex, uncovered_locations  # noqa: E402
+from flowide.executor import completed_future, query_executor  # noqa: E402
+from flowide.process import run_flow  # noqa: E402
+from flowide.query import Buffer, FlowClient  # noqa: E402
+
+
+FAKE_FLOW = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'fake_flow.py'
+)
+SIZES = [1024, 1024 * 1024, 5 * 1024 * 1024]
+COUNTS = [10, 1000, 10000]
+QUICK_SIZES = [1024, 1024 * 1024]
+QUICK_COUNTS = [10, 1000]
+STAGES = ['capture', 'serialize', 'spawn', 'decode', 'convert', 'total']
+
+COMMANDS = {
+    'check': 'check_contents',
+    'coverage': 'coverage',
+    'autocomplete': 'autocomplete',
+}
+
+buffer_ids = itertools.count()
+
+
+def make_contents(size):
+    line = '// @flow\nconst value: number = 42;\n'
+    return (line * (size // len(line) + 1))[:size]
+
+
+def read_buffer(contents):
+    # Stands in for view.substr(), which always returns a fresh copy
+    return (' ' + contents)[1:]
+
+
+# Builds invocations through the real query methods, without running them
+class CapturingClient(FlowClient):
+    def call_cli(self, invocation):
+        self.invocation = invocation
+        return completed_future()
+
+
+def convert(command, result, snapshot):
+    if command == 'check':
+        return ErrorIndex.from_errors(
+            result['errors'], snapshot.text_point
+        ).spans()
+    if command == 'coverage':
+        return locations_to_points(
+            snapshot.text_point, uncovered_locations(result)
+        )
+    completions = CompletionSet(
+        None, '', completion_entries(result['result']), 0
+    )
+    return completions.filter('val')
+
+
+def run_stages(command, path, contents, settings):
+    timings = {}
+    point = len(contents) // 2
+
+    start = time.perf_counter()
+    snapshot = get_buffer_snapshot(
+        next(buffer_ids), 1, lambda: read_buffer(contents)
+    )
+    buffer = Buffer(path, snapshot.contents, point, revision=1)
+    timings['capture'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client = CapturingClient(settings)
+    getattr(client, COMMANDS[command])(buffer).result()
+    invocation = client.invocation
+    serialized = invocation.serialize()
+    timings['serialize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, output = run_flow(serialized, invocation.contents)
+    timings['spawn'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = json.loads(output.decode('utf-8'))
+    timings['decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    convert(command, result, snapshot)
+    timings['convert'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    future = getattr(FlowClient(settings), COMMANDS[command])(buffer)
+    result = future.result()
+    convert(command, result, snapshot)
+    timings['total'] = time.perf_counter() - start
+
+    return timings
+
+
+def benchmark(command, path, size, count, settings, runs):
+    contents = make_contents(size)
+    os.environ['FAKE_FLOW_COUNT'] = str(count)
+    os.environ['FAKE_FLOW_LINES'] = str(contents.count('\n') + 1)
+
+    samples = [run_stages(command, path, contents, settings)
+               for _ in range(runs)]
+    return dict(
+        (stage, statistics.median(sample[stage] for sample in samples))
+        for stage in STAGES
+    )
+
+
+def format_size(size):
+    if size >= 1024 * 1024:
+        return '{} MiB'.format(size // (1024 * 1024))
+    return '{} KiB'.format(size // 1024)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency-ms', type=int, default=0)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--command', choices=sorted(COMMANDS))
+    parser.add_argument(
+        '--quick', action='store_true', help='skip the largest payloads'
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.environ['FAKE_FLOW_LATENCY_MS'] = str(args.latency_ms)
+
+    root = tempfile.mkdtemp()
+    open(os.path.join(root, '.flowconfig'), 'w').close()
+    path = os.path.join(root, 'file.js')
+    settings = {
+        'flow_path': FAKE_FLOW,
+        'result_cache_size': 0,
+        'max_concurrent_queries': 2
+    }
+
+    commands = [args.command] if args.command else sorted(COMMANDS)
+    sizes = QUICK_SIZES if args.quick else SIZES
+    counts = QUICK_COUNTS if args.quick else COUNTS
+
+    print('{:>12}  {:>8}  {:>6}  '.format('command', 'size', 'count') +
+          '  '.join('{:>9}'.format(stage) for stage in STAGES) +
+          '   (median ms)')
+    try:
+        for command, size, count in itertools.product(
+            commands, sizes, counts
+        ):
+            timings = benchmark(
+                command, path, size, count, settings, args.runs
+            )
+            print('{:>12}  {:>8}  {:>6}  '.format(
+                command, format_size(size), count
+            ) + '  '.join(
+                '{:>9.2f}'.format(timings[stage] * 1000) for stage in STAGES
+            ))
+    finally:
+        query_executor.shutdown()
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
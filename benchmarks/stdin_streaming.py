@@ -0,0 +1,91 @@
+# Measures how long it takes to hand buffers of various sizes to a flow
+# stand-in, comparing the old pre-filled os.pipe() stdin with run_flow.
+#
+#   python benchmarks/stdin_streaming.py
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_ROOT)
+
+from flowide.process import run_flow  # noqa: E402
+
+
+# Reads all of stdin like `flow check-contents` does, then answers
+FAKE_FLOW = (
+    'import sys, json; '
+    'contents = sys.stdin.buffer.read(); '
+    'sys.stdout.write(json.dumps({"passed": True, "size": len(contents)}))'
+)
+COMMAND = [sys.executable, '-c', FAKE_FLOW]
+
+SIZES = [1024, 32 * 1024, 64 * 1024, 1024 * 1024, 5 * 1024 * 1024]
+RUNS = 5
+LEGACY_TIMEOUT = 2
+
+
+def make_contents(size):
+    line = '// @flow\nconst value: number = 42;\n'
+    return (line * (size // len(line) + 1))[:size]
+
+
+def legacy_call(contents):
+    read, write = os.pipe()
+    os.write(write, str.encode(contents))
+    os.close(write)
+    try:
+        return subprocess.check_output(
+            COMMAND, stderr=subprocess.STDOUT, stdin=read
+        )
+    finally:
+        os.close(read)
+
+
+def time_legacy(contents):
+    # The old code blocks forever in os.write once contents exceed the
+    # pipe buffer, so run it on a thread we can give up on
+    durations = []
+    for _ in range(RUNS):
+        start = time.time()
+        thread = threading.Thread(target=legacy_call, args=(contents,))
+        thread.daemon = True
+        thread.start()
+        thread.join(LEGACY_TIMEOUT)
+        if thread.is_alive():
+            return None
+        durations.append(time.time() - start)
+    return min(durations)
+
+
+def time_streaming(contents):
+    durations = []
+    for _ in range(RUNS):
+        start = time.time()
+        returncode, output = run_flow(COMMAND, contents)
+        durations.append(time.time() - start)
+        assert returncode == 0, output
+    return min(durations)
+
+
+def format_duration(duration):
+    if duration is None:
+        return 'deadlock'
+    return '{:.1f} ms'.format(duration * 1000)
+
+
+def main():
+    print('{:>12}  {:>12}  {:>12}'.format('size', 'os.pipe', 'run_flow'))
+    for size in SIZES:
+        contents = make_contents(size)
+        print('{:>12}  {:>12}  {:>12}'.format(
+            '{} KiB'.format(size // 1024),
+            format_duration(time_legacy(contents)),
+            format_duration(time_streaming(contents))
+        ))
+
+
+if __name__ == '__main__':
+    main()
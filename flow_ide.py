@@ -1,11 +1,39 @@
+import os
+
 import plugin_state
+import sublime
 
+from .flowide.commands.cache_stats import *  # noqa
+from .flowide.commands.coverage_report import *  # noqa
+from .flowide.commands.error_navigation import *  # noqa
 from .flowide.commands.go_to_definition import *  # noqa
+from .flowide.commands.go_to_symbol import *  # noqa
+from .flowide.commands.performance import *  # noqa
+from .flowide.commands.project_errors import *  # noqa
 from .flowide.commands.type_hint import *  # noqa
+from .flowide.connection import stop_connections
+from .flowide.disk_cache import disk_cache
+from .flowide.executor import query_executor
+from .flowide.settings import unload_settings
+from .flowide.symbols import symbol_indexes
 from .flowide.listeners.autocomplete import *  # noqa
 from .flowide.listeners.check import *  # noqa
 from .flowide.listeners.coverage import *  # noqa
+from .flowide.listeners.definition_prefetch import *  # noqa
+from .flowide.listeners.project import *  # noqa
+from .flowide.listeners.server import *  # noqa
+from .flowide.listeners.type_hover import *  # noqa
 
 
 def plugin_loaded():
     plugin_state.ready = True
+    cache_directory = os.path.join(sublime.cache_path(), 'FlowIDE')
+    disk_cache.set_directory(cache_directory)
+    symbol_indexes.set_directory(cache_directory)
+
+
+def plugin_unloaded():
+    query_executor.shutdown()
+    disk_cache.flush()
+    stop_connections()
+    unload_settings()
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import sys
+
+from .buffer import line_offsets, text_point
+from .connection import stop_connections
+from .errors import error_description
+from .executor import query_executor
+from .metrics import query_outcome
+from .query import Buffer, FlowClient, InvalidContext
+
+
+SETTINGS_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'FlowIDE.sublime-settings'
+)
+
+
+def load_settings(args):
+    try:
+        with open(SETTINGS_FILE) as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        settings = {}
+
+    if args.flow_path:
+        settings['flow_path'] = args.flow_path
+    if args.use_npm_flow:
+        settings['use_npm_flow'] = True
+    if args.persistent:
+        settings['use_persistent_connection'] = True
+    if args.trace_file:
+        settings['trace_file'] = args.trace_file
+    return settings
+
+
+def read_buffer(path, line=None, column=None):
+    path = os.path.abspath(path)
+    with open(path, encoding='utf-8') as f:
+        contents = f.read()
+
+    point = 0
+    if line is not None:
+        point = text_point(
+            line_offsets(contents), len(contents), line - 1, column - 1
+        )
+    return Buffer(path, contents, point)
+
+
+def format_check(path, result):
+    lines = []
+    for error in result.get('errors', []):
+        message = error['message'][0]
+        lines.append('{}:{}:{}: {}'.format(
+            message.get('path') or path, message['line'], message['start'],
+            error_description(error)
+        ))
+    return lines
+
+
+def format_coverage(path, result):
+    expressions = result['expressions']
+    covered = expressions.get('covered_count')
+    uncovered = expressions.get('uncovered_count', 0)
+    if covered is None:
+        # Persistent connections may only know the percentage
+        covered_percent = expressions.get('covered_percent')
+        if covered_percent is None:
+            covered_percent = 0.0 if uncovered else 100.0
+        return ['{}: {:.1f}% covered, {} uncovered'.format(
+            path, covered_percent, uncovered
+        )]
+
+    total = covered + uncovered
+    return ['{}: {}/{} expressions covered ({:.1f}%)'.format(
+        path, covered, total, 100.0 * covered / total if total else 100.0
+    )]
+
+
+def format_type(path, result):
+    return ['{}: {}'.format(path, result.get('type'))]
+
+
+COMMANDS = {
+    'check': ('check_contents', format_check),
+    'coverage': ('coverage', format_coverage),
+    'type-at-pos': ('type_at_pos', format_type),
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m flowide',
+        description='Run FlowIDE queries without Sublime Text.'
+    )
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('files', nargs='+', metavar='file')
+    parser.add_argument(
+        '--line', type=int, help='1-based line, for type-at-pos'
+    )
+    parser.add_argument(
+        '--column', type=int, default=1, help='1-based column'
+    )
+    parser.add_argument('--flow-path', help='Flow binary to use')
+    parser.add_argument(
+        '--use-npm-flow', action='store_true',
+        help='prefer node_modules/.bin/flow under the Flow root'
+    )
+    parser.add_argument(
+        '--persistent', action='store_true',
+        help='query through a persistent flow lsp connection'
+    )
+    parser.add_argument(
+        '--json', action='store_true', help='print raw Flow results'
+    )
+    parser.add_argument(
+        '--trace-file', help='append per-query stage timings as JSON lines'
+    )
+    args = parser.parse_args(argv)
+    if args.command == 'type-at-pos' and args.line is None:
+        parser.error('type-at-pos needs --line')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    method, formatter = COMMANDS[args.command]
+    client = FlowClient(load_settings(args))
+
+    # Every file is queried at once; the executor bounds the concurrency
+    queries = []
+    for path in args.files:
+        buffer = read_buffer(path, args.line, args.column)
+        queries.append((buffer.path, getattr(client, method)(buffer)))
+
+    status = 0
+    try:
+        for path, future in queries:
+            try:
+                result = future.result()
+                if args.json:
+                    lines = [json.dumps({'path': path, 'result': result})]
+                else:
+                    lines = formatter(path, result)
+            except InvalidContext as e:
+                print('{}: skipped, {}'.format(path, e), file=sys.stderr)
+                continue
+            except Exception as e:
+                print('{}: {}'.format(path, e), file=sys.stderr)
+                status = 2
+                continue
+
+            for line in lines:
+                print(line)
+            if result.get('errors'):
+                status = status or 1
+    finally:
+        # Traces are otherwise finished on the worker threads, which may
+        # not get to it before the interpreter exits
+        for _, future in queries:
+            trace = getattr(future, 'trace', None)
+            if trace and future.done():
+                trace.finish(query_outcome(future))
+        query_executor.shutdown()
+        stop_connections()
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from .metrics import metrics
+from .servers import server_registry
+
+
+# Exponential moving averages, weighted towards the latest samples
+LATENCY_WEIGHT = 0.3
+CADENCE_WEIGHT = 0.3
+
+# Queries wait for a pause somewhat longer than the usual gap between
+# keystrokes, and longer still when Flow takes a while to answer them
+CADENCE_FACTOR = 1.5
+LATENCY_FACTOR = 0.5
+
+# Longer gaps are pauses, not typing
+MAX_TYPING_GAP = 1.0
+
+BUSY_STATES = ('initializing', 'rechecking')
+
+
+def moving_average(average, sample, weight):
+    if average is None:
+        return sample
+    return average + weight * (sample - average)
+
+
+# Picks debounce delays per Flow root and command from how long Flow has
+# recently taken to answer and how fast the user types in the view
+class AdaptiveDelay:
+    def __init__(self):
+        self.latencies = {}
+        self.cadences = {}
+        self.keystrokes = {}
+        self.lock = threading.Lock()
+
+    def on_query(self, command, root, outcome, stages):
+        # Only queries Flow actually answered say anything about its speed
+        if outcome != 'ok' or 'server' not in stages:
+            return
+        latency = stages.get('spawn', 0) + stages['server']
+        with self.lock:
+            self.latencies[(root, command)] = moving_average(
+                self.latencies.get((root, command)), latency, LATENCY_WEIGHT
+            )
+
+    def keystroke(self, key, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            previous = self.keystrokes.get(key)
+            self.keystrokes[key] = now
+            if previous is not None and now - previous < MAX_TYPING_GAP:
+                self.cadences[key] = moving_average(
+                    self.cadences.get(key), now - previous, CADENCE_WEIGHT
+                )
+
+    def delay(self, key, root, command, minimum, maximum):
+        if server_registry.state(root) in BUSY_STATES:
+            return maximum
+
+        with self.lock:
+            cadence = self.cadences.get(key)
+            latency = self.latencies.get((root, command))
+
+        delay = minimum
+        if cadence is not None:
+            delay = max(delay, cadence * CADENCE_FACTOR)
+        if latency is not None:
+            delay = max(delay, latency * LATENCY_FACTOR)
+        return min(delay, maximum)
+
+    def forget_view(self, view_id):
+        with self.lock:
+            for key in [key for key in self.keystrokes if key[0] == view_id]:
+                self.keystrokes.pop(key, None)
+                self.cadences.pop(key, None)
+
+
+adaptive_delay = AdaptiveDelay()
+metrics.add_observer(adaptive_delay.on_query)
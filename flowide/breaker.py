@@ -0,0 +1,103 @@
+import threading
+import time
+
+from .scheduler import QueryCancelled
+
+
+# Background queries are refused after this many timeouts or server
+# failures in a row, and one is let through every PROBE_INTERVAL to see
+# if Flow is back
+FAILURE_THRESHOLD = 3
+PROBE_INTERVAL = 30
+
+# Exit codes of the flow CLI that mean the server failed rather than the
+# query or the configuration: out of time, no server running, out of
+# retries, killed by the monitor, restarting and socket errors
+SERVER_FAILURE_CODES = (3, 6, 7, 19, 21, 22)
+
+
+class CircuitOpen(QueryCancelled):
+    pass
+
+
+# Tracks whether the Flow server of each root is answering: 'closed'
+# while it is, 'open' once it has repeatedly failed or timed out, and
+# 'probing' while a single background query tests whether it recovered.
+# Interactive queries always run; any success closes the circuit.
+class CircuitBreaker:
+    def __init__(self, threshold=FAILURE_THRESHOLD,
+                 probe_interval=PROBE_INTERVAL):
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.failures = {}
+        self.opened_at = {}
+        self.probing = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def state(self, root):
+        with self.lock:
+            if root in self.probing:
+                return 'probing'
+            if root in self.opened_at:
+                return 'open'
+            return 'closed'
+
+    # listener(root, state) is called from background threads
+    def add_listener(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def notify(self, root, state):
+        for listener in list(self.listeners):
+            try:
+                listener(root, state)
+            except Exception as e:
+                print('Flow circuit breaker listener failed: ' + str(e))
+
+    def allow(self, root, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            opened_at = self.opened_at.get(root)
+            if opened_at is None:
+                return True
+            # A probe that was superseded never reports back
+            probe_started = self.probing.get(root)
+            if probe_started is not None:
+                if now - probe_started < self.probe_interval:
+                    return False
+            elif now - opened_at < self.probe_interval:
+                return False
+            self.probing[root] = now
+        self.notify(root, 'probing')
+        return True
+
+    def record_success(self, root):
+        with self.lock:
+            self.failures.pop(root, None)
+            if self.opened_at.pop(root, None) is None:
+                return
+            self.probing.pop(root, None)
+        self.notify(root, 'closed')
+
+    def record_failure(self, root, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            failures = self.failures[root] = self.failures.get(root, 0) + 1
+            if failures < self.threshold:
+                return
+            self.opened_at[root] = now
+            self.probing.pop(root, None)
+        self.notify(root, 'open')
+
+    def reset(self):
+        with self.lock:
+            roots = list(self.opened_at)
+            self.failures.clear()
+            self.opened_at.clear()
+            self.probing.clear()
+        for root in roots:
+            self.notify(root, 'closed')
+
+
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,91 @@
+import threading
+from bisect import bisect_right
+
+
+MAGIC_TOKEN = 'AUTO332'
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def insert_magic_token(contents, offset):
+    # Flow's autocomplete finds the cursor by looking for this token
+    return contents[:offset] + MAGIC_TOKEN + contents[offset:]
+
+
+def remove_magic_token(contents):
+    return contents.replace(MAGIC_TOKEN, '', 1)
+
+
+def line_offsets(contents):
+    offsets = [0]
+    find = contents.find
+    position = find('\n')
+    while position != -1:
+        offsets.append(position + 1)
+        position = find('\n', position + 1)
+    return offsets
+
+
+def text_point(offsets, size, row, col):
+    # Same as view.text_point, from a precomputed line offset table
+    if row >= len(offsets):
+        return size
+    return max(0, min(offsets[max(row, 0)] + col, size))
+
+
+def rowcol(offsets, point):
+    # Same as view.rowcol, from a precomputed line offset table
+    row = max(bisect_right(offsets, point) - 1, 0)
+    return row, point - offsets[row]
+
+
+# Converts (row, col, endrow, endcol) locations to sorted, deduplicated
+# (begin, end) points
+def locations_to_points(text_point, locations):
+    return sorted(set(
+        (text_point(row, col), text_point(endrow, endcol))
+        for row, col, endrow, endcol in locations
+    ))
+
+
+class BufferSnapshot:
+    def __init__(self, revision, contents):
+        self.revision = revision
+        self.contents = contents
+        self._line_offsets = None
+
+    @property
+    def line_offsets(self):
+        if self._line_offsets is None:
+            self._line_offsets = line_offsets(self.contents)
+        return self._line_offsets
+
+    def text_point(self, row, col):
+        return text_point(self.line_offsets, len(self.contents), row, col)
+
+    def rowcol(self, point):
+        return rowcol(self.line_offsets, point)
+
+
+def get_buffer_snapshot(buffer_id, revision, read_contents):
+    # Every query and renderer working on the same buffer revision
+    # shares one copy of its contents and its line offset table
+    with _snapshots_lock:
+        snapshot = _snapshots.get(buffer_id)
+    if snapshot and snapshot.revision == revision:
+        return snapshot
+
+    snapshot = BufferSnapshot(revision, read_contents())
+    with _snapshots_lock:
+        _snapshots[buffer_id] = snapshot
+    return snapshot
+
+
+def buffer_snapshot(buffer_id, revision, read_contents):
+    return get_buffer_snapshot(buffer_id, revision, read_contents).contents
+
+
+def discard_buffer_snapshot(buffer_id):
+    with _snapshots_lock:
+        _snapshots.pop(buffer_id, None)
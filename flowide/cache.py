@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from .paths import cached_fingerprint, resolve_flow_bin
+
+
+CACHED_COMMANDS = ('check-contents', 'coverage', 'type-at-pos')
+DEFAULT_CACHE_SIZE = 256
+
+
+def hash_contents(contents):
+    return hashlib.sha1((contents or '').encode('utf-8')).hexdigest()
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except (OSError, TypeError):
+        return None
+
+
+def root_fingerprint(root, bin):
+    resolved_bin = resolve_flow_bin(bin)
+    return (
+        file_mtime(os.path.join(root, '.flowconfig')),
+        resolved_bin,
+        file_mtime(resolved_bin)
+    )
+
+
+class ResultCache:
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.fingerprints = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, invocation):
+        if invocation.name not in CACHED_COMMANDS:
+            return None
+
+        return (
+            invocation.name,
+            invocation._root,
+            invocation._path or invocation.filename,
+            invocation.row,
+            invocation.col,
+            invocation.content_hash
+        )
+
+    def resize(self, max_size):
+        with self.lock:
+            self.max_size = max_size
+            self.evict()
+
+    def evict(self):
+        while len(self.entries) > max(self.max_size, 0):
+            self.entries.popitem(last=False)
+
+    def validate(self, root, bin):
+        # Results are only valid for the .flowconfig and binary they
+        # were computed with
+        # Cached, as this runs for every query, cache hits included
+        fingerprint = cached_fingerprint(root, bin, root_fingerprint)
+        with self.lock:
+            if self.fingerprints.get(root) != fingerprint:
+                self.invalidate_root_locked(root)
+                self.fingerprints[root] = fingerprint
+
+    def invalidate_root(self, root):
+        with self.lock:
+            self.invalidate_root_locked(root)
+
+    def invalidate_root_locked(self, root):
+        for key in [key for key in self.entries if key[1] == root]:
+            del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.fingerprints.clear()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            self.evict()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self.entries),
+                'max_size': self.max_size
+            }
+
+
+result_cache = ResultCache()
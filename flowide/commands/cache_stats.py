@@ -0,0 +1,24 @@
+import sublime
+import sublime_plugin
+
+from ..cache import result_cache
+from ..disk_cache import disk_cache
+
+
+class FlowCacheStats(sublime_plugin.WindowCommand):
+    def run(self):
+        stats = result_cache.stats()
+        sublime.status_message(
+            'Flow cache: {} hit{}, {} miss{} ({:.0%}), {}/{} entries'.format(
+                stats['hits'], '' if stats['hits'] == 1 else 's',
+                stats['misses'], '' if stats['misses'] == 1 else 'es',
+                stats['hit_rate'],
+                stats['size'], stats['max_size']
+            )
+        )
+
+
+class FlowClearPersistentCache(sublime_plugin.WindowCommand):
+    def run(self):
+        disk_cache.clear()
+        sublime.status_message('Flow persistent cache cleared')
@@ -0,0 +1,71 @@
+import threading
+import sublime
+import sublime_plugin
+
+from ..coverage_report import (
+    DEFAULT_WORKERS,
+    SORT_KEYS,
+    collect_coverage,
+    format_report
+)
+from ..paths import find_flow_bin, find_flow_config
+from ..settings import view_settings
+
+
+SORT_ORDERS = sorted(SORT_KEYS)
+
+
+class FlowProjectCoverage(sublime_plugin.WindowCommand):
+    def run(self, sort_by=None):
+        view = self.window.active_view()
+        root = find_flow_config(view.file_name() if view else None)
+        if root == '/':
+            sublime.status_message('Flow: no .flowconfig found')
+            return
+
+        if sort_by not in SORT_KEYS:
+            self.window.show_quick_panel(
+                ['Sort by {}'.format(order) for order in SORT_ORDERS],
+                self.on_sort_selected
+            )
+            return
+
+        settings = view_settings(view)
+        workers = settings.get('coverage_report_workers')
+        if workers is None:
+            workers = DEFAULT_WORKERS
+        thread = threading.Thread(target=self.report, args=(
+            root, find_flow_bin(root, settings), workers, sort_by
+        ))
+        thread.daemon = True
+        thread.start()
+
+    def on_sort_selected(self, index):
+        if index >= 0:
+            self.window.run_command(
+                'flow_project_coverage', {'sort_by': SORT_ORDERS[index]}
+            )
+
+    def report(self, root, bin, workers, sort_by):
+        def on_progress(done, total):
+            sublime.status_message(
+                'Flow coverage: {}/{} files'.format(done, total)
+            )
+
+        try:
+            results = collect_coverage(bin, root, workers, on_progress)
+        except Exception as e:
+            print('Flow coverage report failed for {}: {}'.format(root, e))
+            sublime.status_message('Flow coverage report failed')
+            return
+
+        text = format_report(root, results, sort_by)
+        sublime.set_timeout(lambda: self.show_report(text))
+
+    def show_report(self, text):
+        view = self.window.new_file()
+        view.set_name('Flow Coverage')
+        view.set_scratch(True)
+        view.settings().set('word_wrap', False)
+        view.run_command('append', {'characters': text})
+        view.set_read_only(True)
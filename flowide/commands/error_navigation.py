@@ -0,0 +1,36 @@
+import sublime
+import sublime_plugin
+
+from ..state import view_state
+
+
+def go_to_error(view, forward):
+    state = view_state(view)
+    error_index = state.error_index
+    if not error_index or not len(error_index):
+        sublime.status_message('Flow: no errors')
+        return
+    # Offsets from an older revision would land in the wrong places
+    if state.check_revision != view.change_count():
+        sublime.status_message('Flow: errors are being rechecked')
+        return
+
+    point = view.sel()[0].begin()
+    if forward:
+        span = error_index.next_span(point)
+    else:
+        span = error_index.previous_span(point)
+
+    view.sel().clear()
+    view.sel().add(sublime.Region(span[0]))
+    view.show_at_center(span[0])
+
+
+class FlowNextError(sublime_plugin.TextCommand):
+    def run(self, edit):
+        go_to_error(self.view, forward=True)
+
+
+class FlowPreviousError(sublime_plugin.TextCommand):
+    def run(self, edit):
+        go_to_error(self.view, forward=False)
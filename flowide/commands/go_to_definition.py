@@ -1,35 +1,110 @@
 import sublime
 import sublime_plugin
 
-from ..cli import CLI, InvalidContext
+from ..adaptive_delay import BUSY_STATES
+from ..breaker import circuit_breaker
+from ..cli import CLI
+from ..definitions import cached_definition, query_definition, store_definition
+from ..paths import find_flow_config
+from ..query import InvalidContext
+from ..scheduler import QueryCancelled, QueryTimedOut
+from ..servers import server_registry
+from ..settings import view_settings
+from ..symbols import symbol_indexes
+from ..type_hints import token_span
 from ..util import wait_for_load
-from ..view import display_unknown_error
+from ..view import display_unknown_error, when_done
+from .go_to_symbol import open_symbol, show_symbols
+
+
+def open_definition(window, result):
+    window.open_file(
+        result['path'] +
+        ':' + str(result['line']) +
+        ':' + str(result['start']),
+        sublime.ENCODED_POSITION |
+        sublime.TRANSIENT
+    )
 
 
 class FlowGoToDefinition(sublime_plugin.TextCommand):
     def run(self, edit):
-        sublime.set_timeout_async(self.run_async)
+        span = token_span(self.view, self.view.sel()[0].begin())
+        sublime.set_timeout_async(lambda: self.run_async(span))
 
     @wait_for_load
-    def run_async(self):
+    def run_async(self, span):
+        # Checking a cached definition stats its target, which can be slow
+        # on network mounts, so it happens here rather than in run()
+        cached = cached_definition(self.view, span) if span else None
+        if cached is not None:
+            if cached.get('path'):
+                window = self.view.window()
+                sublime.set_timeout(lambda: open_definition(window, cached))
+            return
+
+        if self.jump_from_index(span):
+            return
+
+        revision = self.view.change_count()
+        if span:
+            future = query_definition(self.view, span)
+        else:
+            future = CLI(self.view).get_def()
+        when_done(
+            future,
+            lambda future: self.on_definition_result(revision, span, future)
+        )
+
+    def jump_from_index(self, span):
+        # While the server can't answer quickly, a declaration of the name
+        # under the cursor in the symbol index is the next best thing
+        filename = self.view.file_name()
+        root = find_flow_config(filename)
+        if root == '/' or (
+            server_registry.state(root) not in BUSY_STATES and
+            circuit_breaker.state(root) == 'closed'
+        ):
+            return False
+
+        index = symbol_indexes.existing(root)
+        if not index or not span:
+            return False
+        matches, certain = index.definition_candidates(
+            self.view.substr(sublime.Region(*span)), filename
+        )
+        if not matches:
+            return False
+
+        # Names that aren't imports or top-level declarations of this file
+        # may be locals, so let the user pick rather than guess
+        window = self.view.window()
+        if certain:
+            sublime.set_timeout(lambda: open_symbol(window, *matches[0]))
+        else:
+            sublime.set_timeout(lambda: show_symbols(window, root, matches))
+        return True
+
+    def on_definition_result(self, revision, span, future):
         result = None
         try:
-            result = CLI(self.view).get_def()
+            result = future.result()
         except InvalidContext:
-            print('Invalid context')
             pass
+        except QueryTimedOut as e:
+            sublime.status_message(str(e))
+            return
+        except QueryCancelled:
+            return
         except Exception as e:
             display_unknown_error(self.view, e)
             return
 
-        print(result)
+        if view_settings(self.view).get('log_queries'):
+            print(result)
+        if span:
+            store_definition(self.view, revision, span, result)
         if not result or not result.get('path'):
             return
 
-        sublime.active_window().open_file(
-            result['path'] +
-            ':' + str(result['line']) +
-            ':' + str(result['start']),
-            sublime.ENCODED_POSITION |
-            sublime.TRANSIENT
-        )
+        open_definition(sublime.active_window(), result)
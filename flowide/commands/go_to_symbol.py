@@ -0,0 +1,80 @@
+import os
+import threading
+import sublime
+import sublime_plugin
+
+from ..coverage_report import DEFAULT_WORKERS
+from ..paths import find_flow_bin, find_flow_config
+from ..settings import view_settings
+from ..symbols import COLUMN, KIND, LINE, NAME, symbol_indexes
+
+
+def open_symbol(window, path, symbol):
+    window.open_file(
+        '{}:{}:{}'.format(path, symbol[LINE], symbol[COLUMN]),
+        sublime.ENCODED_POSITION
+    )
+
+
+def show_symbols(window, root, matches):
+    # Sublime's quick panel does the fuzzy matching
+    items = [
+        [symbol[NAME], '{} {}:{}'.format(
+            symbol[KIND], os.path.relpath(path, root), symbol[LINE]
+        )]
+        for path, symbol in matches
+    ]
+
+    def on_done(index):
+        if index >= 0:
+            open_symbol(window, *matches[index])
+
+    window.show_quick_panel(items, on_done)
+
+
+class FlowGoToSymbol(sublime_plugin.WindowCommand):
+    def run(self):
+        view = self.window.active_view()
+        root = find_flow_config(view.file_name() if view else None)
+        if root == '/':
+            sublime.status_message('Flow: no .flowconfig found')
+            return
+
+        settings = view_settings(view)
+        workers = settings.get('coverage_report_workers')
+        if workers is None:
+            workers = DEFAULT_WORKERS
+        thread = threading.Thread(target=self.index_and_show, args=(
+            root, find_flow_bin(root, settings), workers
+        ))
+        thread.daemon = True
+        thread.start()
+
+    def index_and_show(self, root, bin, workers):
+        index = symbol_indexes.get(root)
+        matches = index.symbols()
+
+        # A saved index is shown right away and brought up to date in the
+        # background; without one, wait for it to be built
+        if not index.refreshed:
+            if matches:
+                index.refresh_in_background(bin, workers)
+            else:
+                def on_progress(done, total):
+                    sublime.status_message(
+                        'Flow: indexing symbols, {}/{} files'.format(
+                            done, total
+                        )
+                    )
+                index.refresh(bin, workers, on_progress)
+                matches = index.symbols()
+
+        if not matches:
+            sublime.status_message(
+                'Flow: still indexing symbols' if index.refreshing
+                else 'Flow: no symbols found'
+            )
+            return
+        sublime.set_timeout(
+            lambda: show_symbols(self.window, root, matches)
+        )
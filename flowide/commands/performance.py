@@ -0,0 +1,28 @@
+import sublime_plugin
+
+from ..metrics import metrics
+
+
+PANEL_NAME = 'flow_performance'
+
+
+class FlowPerformance(sublime_plugin.WindowCommand):
+    def run(self, reset=False):
+        if reset:
+            metrics.clear()
+
+        panel = self.window.find_output_panel(PANEL_NAME) or \
+            self.window.create_output_panel(PANEL_NAME)
+        panel.settings().set('word_wrap', False)
+        panel.set_read_only(False)
+        panel.run_command('select_all')
+        panel.run_command('right_delete')
+        panel.run_command('append', {
+            'characters': metrics.report(),
+            'force': True,
+            'scroll_to_end': False
+        })
+        panel.set_read_only(True)
+        self.window.run_command(
+            'show_panel', {'panel': 'output.' + PANEL_NAME}
+        )
@@ -0,0 +1,23 @@
+import sublime
+import sublime_plugin
+
+from ..paths import find_flow_bin, find_flow_config
+from ..project_errors import PANEL_NAME, enable_project_diagnostics
+from ..settings import view_settings
+
+
+class FlowProjectErrors(sublime_plugin.WindowCommand):
+    def run(self):
+        view = self.window.active_view()
+        root = find_flow_config(view.file_name() if view else None)
+        if root == '/':
+            sublime.status_message('Flow: no .flowconfig found')
+            return
+
+        diagnostics = enable_project_diagnostics(
+            self.window, root, find_flow_bin(root, view_settings(view))
+        )
+        self.window.run_command(
+            'show_panel', {'panel': 'output.' + PANEL_NAME}
+        )
+        diagnostics.refresh()
@@ -1,20 +1,41 @@
 import sublime
 import sublime_plugin
 
-from ..cli import CLI, InvalidContext
+from ..cli import CLI
+from ..query import InvalidContext
+from ..scheduler import QueryCancelled, QueryTimedOut
+from ..type_hints import show_type_popup, store_type, token_span, type_cache
 from ..util import wait_for_load
-from ..view import display_unknown_error
+from ..view import display_unknown_error, when_done
 
 
 class FlowTypeHint(sublime_plugin.TextCommand):
     def run(self, edit):
-        sublime.set_timeout_async(self.run_async)
+        span = token_span(self.view, self.view.sel()[0].begin())
+        cached = type_cache(self.view).get(span) if span else None
+        if cached is not None:
+            show_type_popup(self.view, cached)
+            return
+
+        sublime.set_timeout_async(lambda: self.run_async(span))
 
     @wait_for_load
-    def run_async(self):
+    def run_async(self, span):
+        revision = self.view.change_count()
+        when_done(
+            CLI(self.view).type_at_pos(),
+            lambda future: self.on_type_result(revision, span, future)
+        )
+
+    def on_type_result(self, revision, span, future):
         result = None
         try:
-            result = CLI(self.view).type_at_pos()
+            result = future.result()
+        except QueryTimedOut as e:
+            sublime.status_message(str(e))
+            return
+        except QueryCancelled:
+            return
         except InvalidContext:
             pass
         except Exception as e:
@@ -22,4 +43,6 @@ class FlowTypeHint(sublime_plugin.TextCommand):
             return
 
         if result:
-            self.view.show_popup(result['type'])
+            if span:
+                store_type(self.view, revision, span, result)
+            show_type_popup(self.view, result['type'])
@@ -0,0 +1,83 @@
+def build_snippet(name, params):
+    snippet = name + '({})'
+    paramText = ''
+
+    for param in params:
+        if not paramText:
+            paramText += param['name']
+        else:
+            paramText += ', ' + param['name']
+
+    return snippet.format(paramText)
+
+
+def completion_entries(matches, omit_function_parameters=False):
+    return [
+        (
+            match['name'],
+            (
+                # matching text
+                match['name'] + '\t' + match['type'],
+                # inserted text
+                build_snippet(
+                    match['name'],
+                    match.get('func_details')['params']
+                )
+                if (
+                    match.get('func_details') and
+                    not omit_function_parameters
+                )
+                else match['name']
+            )
+        )
+        for match in matches
+    ]
+
+
+def match_score(name, prefix):
+    if not prefix or name.startswith(prefix):
+        return (0, len(name))
+
+    lower_name = name.lower()
+    lower_prefix = prefix.lower()
+    if lower_name.startswith(lower_prefix):
+        return (1, len(name))
+
+    # Fuzzy: every prefix character appears in order; tighter spans rank
+    # higher
+    position = -1
+    first = None
+    for char in lower_prefix:
+        position = lower_name.find(char, position + 1)
+        if position == -1:
+            return None
+        if first is None:
+            first = position
+    return (2, position - first, len(name))
+
+
+def rank_completions(completions, prefix):
+    scored = []
+    for name, completion in completions:
+        score = match_score(name, prefix)
+        if score is not None:
+            scored.append((score, name, completion))
+    scored.sort(key=lambda entry: (entry[0], entry[1]))
+    return [completion for _, _, completion in scored]
+
+
+# Flow's results for one completion anchor (same line, same token start,
+# same text before it), reused while more of the identifier is typed.
+class CompletionSet:
+    def __init__(self, anchor, prefix, completions, flags):
+        self.anchor = anchor
+        self.prefix = prefix
+        # [(name, (trigger, contents))], snippets already built
+        self.completions = completions
+        self.flags = flags
+
+    def matches(self, anchor, prefix):
+        return anchor == self.anchor and prefix.startswith(self.prefix)
+
+    def filter(self, prefix):
+        return rank_completions(self.completions, prefix)
@@ -0,0 +1,539 @@
+import json
+import re
+import subprocess
+import threading
+import time
+from urllib.parse import quote, unquote
+
+from .buffer import remove_magic_token
+
+
+REQUEST_TIMEOUT = 10
+RESTART_DELAY = 30
+REQUEST_CANCELLED = -32800
+
+SNIPPET_PLACEHOLDER = re.compile(r'\$\{\d+:([^}]*)\}')
+
+
+class ConnectionFailed(RuntimeError):
+    pass
+
+
+def path_to_uri(path):
+    return 'file://' + quote(path)
+
+
+def uri_to_path(uri):
+    if uri.startswith('file://'):
+        uri = uri[len('file://'):]
+    return unquote(uri)
+
+
+def server_state_from_status(params):
+    message = (
+        params.get('shortMessage') or params.get('message') or ''
+    ).lower()
+    if 'initializ' in message:
+        return 'initializing'
+    if 'recheck' in message:
+        return 'rechecking'
+    return 'ready'
+
+
+_status_listeners = []
+
+
+# listener(root, previous_state, state) is called from the connection's
+# reader thread whenever Flow reports a server state change
+def add_status_listener(listener):
+    if listener not in _status_listeners:
+        _status_listeners.append(listener)
+
+
+def remove_status_listener(listener):
+    if listener in _status_listeners:
+        _status_listeners.remove(listener)
+
+
+def lsp_position(row, col):
+    return {'line': row, 'character': col}
+
+
+class PendingRequest:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def resolve(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+
+class FlowConnection:
+    def __init__(self, bin, root):
+        self.bin = bin
+        self.root = root
+        self.process = None
+        self.server_state = 'initializing'
+        self.status_received = False
+        self.next_id = 0
+        self.pending = {}
+        self.documents = {}
+        self.diagnostics = {}
+        self.diagnostics_generation = {}
+        self.diagnostics_changed = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.documents_lock = threading.Lock()
+        self.lock = threading.Lock()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        try:
+            self.process = subprocess.Popen(
+                [self.bin, 'lsp', '--from', 'nuclide'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=self.root,
+                shell=False
+            )
+        except OSError as e:
+            raise ConnectionFailed('Could not start flow lsp: ' + str(e))
+
+        reader = threading.Thread(target=self.read_messages)
+        reader.daemon = True
+        reader.start()
+
+        self.request('initialize', {
+            'processId': None,
+            'rootUri': path_to_uri(self.root),
+            'rootPath': self.root,
+            'capabilities': {
+                'textDocument': {
+                    'completion': {
+                        'completionItem': {'snippetSupport': True}
+                    }
+                }
+            }
+        })
+        self.notify('initialized', {})
+
+    def stop(self):
+        if not self.alive:
+            return
+        try:
+            self.request('shutdown', None, timeout=2)
+            self.notify('exit', None)
+        except ConnectionFailed:
+            pass
+        if self.alive:
+            self.process.kill()
+
+    # Wire protocol
+
+    def send(self, message):
+        message['jsonrpc'] = '2.0'
+        body = json.dumps(message).encode('utf-8')
+        header = 'Content-Length: {}\r\n\r\n'.format(len(body))
+        with self.write_lock:
+            if not self.alive:
+                raise ConnectionFailed('flow lsp is not running.')
+            try:
+                self.process.stdin.write(header.encode('ascii') + body)
+                self.process.stdin.flush()
+            except (OSError, ValueError) as e:
+                raise ConnectionFailed(
+                    'Could not write to flow lsp: ' + str(e)
+                )
+
+    def notify(self, method, params):
+        self.send({'method': method, 'params': params})
+
+    def request(self, method, params, timeout=REQUEST_TIMEOUT, token=None):
+        pending = PendingRequest()
+        with self.lock:
+            self.next_id += 1
+            request_id = self.next_id
+            self.pending[request_id] = pending
+
+        def cancel():
+            pending.resolve(error={
+                'code': REQUEST_CANCELLED,
+                'message': 'Request cancelled.'
+            })
+            try:
+                self.notify('$/cancelRequest', {'id': request_id})
+            except ConnectionFailed:
+                pass
+
+        if token:
+            token.on_cancel(cancel)
+
+        try:
+            self.send({'id': request_id, 'method': method, 'params': params})
+            if not pending.done.wait(timeout):
+                raise ConnectionFailed(
+                    'flow lsp timed out on {}.'.format(method)
+                )
+        finally:
+            with self.lock:
+                self.pending.pop(request_id, None)
+            if token:
+                token.remove_canceller(cancel)
+
+        if token:
+            token.raise_if_cancelled()
+        if pending.error is not None:
+            raise ConnectionFailed(
+                'flow lsp failed on {}: {}'.format(
+                    method, pending.error.get('message')
+                )
+            )
+        return pending.result
+
+    def read_message(self):
+        stdout = self.process.stdout
+        content_length = None
+        while True:
+            line = stdout.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode('ascii').partition(':')
+            if name.lower() == 'content-length':
+                content_length = int(value.strip())
+
+        if content_length is None:
+            return {}
+        return json.loads(stdout.read(content_length).decode('utf-8'))
+
+    def read_messages(self):
+        try:
+            while True:
+                message = self.read_message()
+                if message is None:
+                    break
+                self.dispatch(message)
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                pending = list(self.pending.values())
+                self.pending.clear()
+            for request in pending:
+                request.resolve(error={'message': 'connection closed'})
+            with self.diagnostics_changed:
+                self.diagnostics_changed.notify_all()
+
+    def dispatch(self, message):
+        method = message.get('method')
+        if method is None:
+            with self.lock:
+                pending = self.pending.get(message.get('id'))
+            if pending:
+                pending.resolve(message.get('result'), message.get('error'))
+            return
+
+        if method == 'window/showStatus':
+            self.update_server_state(
+                server_state_from_status(message.get('params') or {})
+            )
+
+        if 'id' in message:
+            # Server-to-client requests (showStatus, showMessageRequest,
+            # registerCapability...) only need an acknowledgement
+            self.send({'id': message['id'], 'result': None})
+            return
+
+        if method == 'textDocument/publishDiagnostics':
+            params = message.get('params') or {}
+            uri = params.get('uri')
+            with self.diagnostics_changed:
+                self.diagnostics[uri] = params.get('diagnostics', [])
+                self.diagnostics_generation[uri] = \
+                    self.diagnostics_generation.get(uri, 0) + 1
+                self.diagnostics_changed.notify_all()
+
+    def update_server_state(self, state):
+        previous = self.server_state
+        self.server_state = state
+        # The first status is always passed on, it may confirm the
+        # initial 'initializing'
+        if state == previous and self.status_received:
+            return
+        self.status_received = True
+        for listener in list(_status_listeners):
+            try:
+                listener(self.root, previous, state)
+            except Exception as e:
+                print('Flow status listener failed: ' + str(e))
+
+    # Document sync
+
+    def sync_document(self, path, contents):
+        uri = path_to_uri(path)
+        with self.documents_lock:
+            document = self.documents.get(uri)
+            if document and document[1] == contents:
+                return uri, False
+
+            if not document:
+                version = 1
+                self.notify('textDocument/didOpen', {
+                    'textDocument': {
+                        'uri': uri,
+                        'languageId': 'javascript',
+                        'version': version,
+                        'text': contents
+                    }
+                })
+            else:
+                version = document[0] + 1
+                self.notify('textDocument/didChange', {
+                    'textDocument': {'uri': uri, 'version': version},
+                    'contentChanges': [{'text': contents}]
+                })
+
+            self.documents[uri] = (version, contents)
+        return uri, True
+
+    def text_document_position(self, uri, row, col):
+        return {
+            'textDocument': {'uri': uri},
+            'position': lsp_position(row, col)
+        }
+
+    # Queries, answered in the same shape as the flow CLI's JSON output
+
+    def query(self, invocation):
+        handler = {
+            'check-contents': self.check_contents,
+            'coverage': self.coverage,
+            'autocomplete': self.autocomplete,
+            'type-at-pos': self.type_at_pos,
+            'get-def': self.get_def,
+        }.get(invocation.name)
+        if not handler:
+            raise ConnectionFailed(
+                'flow lsp does not support ' + invocation.name
+            )
+        return handler(invocation)
+
+    def wake_diagnostics_waiters(self):
+        with self.diagnostics_changed:
+            self.diagnostics_changed.notify_all()
+
+    def check_contents(self, invocation):
+        token = invocation.token
+        if token:
+            token.on_cancel(self.wake_diagnostics_waiters)
+
+        try:
+            # Syncing writes to Flow's stdin, so it can't hold the
+            # condition the reader thread needs to record diagnostics
+            uri = path_to_uri(invocation.filename)
+            with self.diagnostics_changed:
+                generation = self.diagnostics_generation.get(uri, 0)
+            uri, changed = self.sync_document(
+                invocation.filename, invocation.contents
+            )
+            with self.diagnostics_changed:
+                waiting = changed or uri not in self.diagnostics
+                deadline = time.time() + REQUEST_TIMEOUT
+                while waiting and not (token and token.cancelled):
+                    if self.diagnostics_generation.get(uri, 0) != generation:
+                        waiting = False
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or not self.alive:
+                        break
+                    self.diagnostics_changed.wait(remaining)
+                diagnostics = self.diagnostics.get(uri)
+        finally:
+            if token:
+                token.remove_canceller(self.wake_diagnostics_waiters)
+
+        if token:
+            token.raise_if_cancelled()
+
+        if waiting:
+            # Whatever is recorded is for earlier contents
+            raise ConnectionFailed(
+                'flow lsp published no diagnostics in time.'
+            )
+        if diagnostics is None:
+            raise ConnectionFailed('flow lsp published no diagnostics.')
+
+        errors = []
+        for diagnostic in diagnostics:
+            start = diagnostic['range']['start']
+            end = diagnostic['range']['end']
+            errors.append({
+                'message': [{
+                    'line': start['line'] + 1,
+                    'endline': end['line'] + 1,
+                    'start': start['character'] + 1,
+                    'end': end['character'],
+                    'descr': diagnostic.get('message', '')
+                }]
+            })
+        return {'passed': not errors, 'errors': errors}
+
+    def coverage(self, invocation):
+        uri, _ = self.sync_document(invocation.filename, invocation.contents)
+        result = self.request(
+            'textDocument/typeCoverage',
+            {'textDocument': {'uri': uri}},
+            token=invocation.token
+        ) or {}
+
+        uncovered_locs = []
+        for uncovered in result.get('uncoveredRanges', []):
+            start = uncovered['range']['start']
+            end = uncovered['range']['end']
+            uncovered_locs.append({
+                'start': {
+                    'line': start['line'] + 1,
+                    'column': start['character'] + 1
+                },
+                'end': {
+                    'line': end['line'] + 1,
+                    'column': end['character']
+                }
+            })
+        expressions = {
+            'uncovered_count': len(uncovered_locs),
+            'uncovered_locs': uncovered_locs
+        }
+        # flow lsp only reports a percentage; the covered count follows
+        # from it, unless nothing is uncovered to scale it by
+        covered_percent = result.get('coveredPercent')
+        if covered_percent is not None:
+            expressions['covered_percent'] = covered_percent
+            if uncovered_locs and covered_percent < 100:
+                expressions['covered_count'] = int(round(
+                    len(uncovered_locs) * covered_percent /
+                    (100.0 - covered_percent)
+                ))
+        return {'expressions': expressions}
+
+    def autocomplete(self, invocation):
+        row, col = invocation.cursor
+        uri, _ = self.sync_document(
+            invocation.filename,
+            remove_magic_token(invocation.contents)
+        )
+        result = self.request(
+            'textDocument/completion',
+            self.text_document_position(uri, row, col),
+            token=invocation.token
+        ) or []
+        if isinstance(result, dict):
+            result = result.get('items', [])
+
+        matches = []
+        for item in result:
+            match = {
+                'name': item['label'],
+                'type': item.get('detail') or ''
+            }
+            if item.get('insertTextFormat') == 2 and item.get('insertText'):
+                params = SNIPPET_PLACEHOLDER.findall(item['insertText'])
+                match['func_details'] = {
+                    'params': [{'name': param} for param in params]
+                }
+            matches.append(match)
+        return {'result': matches}
+
+    def type_at_pos(self, invocation):
+        uri, _ = self.sync_document(invocation.path, invocation.contents)
+        result = self.request(
+            'textDocument/hover',
+            self.text_document_position(uri, invocation.row, invocation.col),
+            token=invocation.token
+        )
+        if not result or not result.get('contents'):
+            return None
+
+        contents = result['contents']
+        if not isinstance(contents, list):
+            contents = [contents]
+        parts = [
+            content if isinstance(content, str) else content.get('value', '')
+            for content in contents
+        ]
+        return {'type': '\n'.join(part for part in parts if part)}
+
+    def get_def(self, invocation):
+        uri, _ = self.sync_document(invocation.path, invocation.contents)
+        result = self.request(
+            'textDocument/definition',
+            self.text_document_position(uri, invocation.row, invocation.col),
+            token=invocation.token
+        )
+        if isinstance(result, list):
+            result = result[0] if result else None
+        if not result:
+            return {'path': ''}
+
+        start = result['range']['start']
+        end = result['range']['end']
+        return {
+            'path': uri_to_path(result['uri']),
+            'line': start['line'] + 1,
+            'endline': end['line'] + 1,
+            'start': start['character'] + 1,
+            'end': end['character']
+        }
+
+
+_connections = {}
+_failed_at = {}
+_connections_lock = threading.Lock()
+
+
+def get_connection(bin, root):
+    key = (bin, root)
+    with _connections_lock:
+        connection = _connections.get(key)
+        if connection and connection.alive:
+            return connection
+
+        # Don't retry a binary without `flow lsp` on every keystroke
+        failed_at = _failed_at.get(key)
+        if failed_at and time.time() - failed_at < RESTART_DELAY:
+            raise ConnectionFailed('flow lsp recently failed to start.')
+
+        connection = FlowConnection(bin, root)
+        try:
+            connection.start()
+        except ConnectionFailed:
+            _failed_at[key] = time.time()
+            if connection.alive:
+                connection.process.kill()
+            raise
+
+        _failed_at.pop(key, None)
+        _connections[key] = connection
+        return connection
+
+
+def query_connection(invocation):
+    if not invocation.bin or not invocation._root:
+        raise ConnectionFailed('No flow root to connect to.')
+    return get_connection(invocation.bin, invocation._root).query(invocation)
+
+
+def stop_connections():
+    with _connections_lock:
+        connections = list(_connections.values())
+        _connections.clear()
+    for connection in connections:
+        connection.stop()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .process import run_flow
+
+
+JS_EXTENSIONS = ('.js', '.jsx', '.mjs')
+SKIPPED_DIRECTORIES = ('node_modules', 'flow-typed')
+FLOW_PRAGMAS = (b'// @flow', b'/* @flow')
+BATCH_SIZE = 200
+DEFAULT_WORKERS = 4
+
+SORT_KEYS = {
+    'path': lambda row: row['path'],
+    'coverage': lambda row: (row['percent'], row['path']),
+    'uncovered': lambda row: (-row['uncovered'], row['path']),
+}
+
+# path -> (content hash, {'covered': n, 'uncovered': n})
+_file_results = {}
+_file_results_lock = threading.Lock()
+_batch_support = {}
+
+
+def find_flow_files(root):
+    for directory, directories, filenames in os.walk(root):
+        directories[:] = [
+            name for name in directories
+            if name not in SKIPPED_DIRECTORIES and not name.startswith('.')
+        ]
+        for filename in filenames:
+            if filename.endswith(JS_EXTENSIONS):
+                yield os.path.join(directory, filename)
+
+
+def read_flow_file(path):
+    try:
+        with open(path, 'rb') as f:
+            contents = f.read()
+    except OSError:
+        return None
+    if not any(pragma in contents for pragma in FLOW_PRAGMAS):
+        return None
+    return contents
+
+
+def cached_file_result(path, content_hash):
+    with _file_results_lock:
+        cached = _file_results.get(path)
+    if cached and cached[0] == content_hash:
+        return cached[1]
+    return None
+
+
+def store_file_result(path, content_hash, result):
+    with _file_results_lock:
+        _file_results[path] = (content_hash, result)
+
+
+def supports_batch_coverage(bin):
+    if bin not in _batch_support:
+        try:
+            returncode, _ = run_flow([bin, 'batch-coverage', '--help'], '')
+            _batch_support[bin] = returncode == 0
+        except OSError:
+            _batch_support[bin] = False
+    return _batch_support[bin]
+
+
+def file_coverage(bin, root, path, contents):
+    returncode, output = run_flow(
+        [bin, 'coverage', '--from', 'nuclide', '--json', '--root', root,
+         path],
+        contents.decode('utf-8', 'replace')
+    )
+    expressions = json.loads(output.decode('utf-8'))['expressions']
+    return {
+        'covered': expressions.get('covered_count', 0),
+        'uncovered': expressions.get('uncovered_count', 0)
+    }
+
+
+def read_file_coverage(bin, root, path):
+    # Contents are only held while their query runs
+    contents = read_flow_file(path)
+    if contents is None:
+        raise OSError('{} is no longer a @flow file'.format(path))
+    return file_coverage(bin, root, path, contents)
+
+
+def batch_coverage(bin, root, paths):
+    returncode, output = run_flow(
+        [bin, 'batch-coverage', '--from', 'nuclide', '--json',
+         '--root', root] + paths,
+        ''
+    )
+    results = {}
+    for entry in json.loads(output.decode('utf-8')).get('files', []):
+        results[entry['file']] = {
+            'covered': entry.get('covered', 0),
+            'uncovered': entry.get('uncovered', 0)
+        }
+    return results
+
+
+def collect_coverage(bin, root, workers=DEFAULT_WORKERS, on_progress=None):
+    results = {}
+    # path -> content hash; batch-coverage reads the files itself
+    stale = {}
+    for path in find_flow_files(root):
+        contents = read_flow_file(path)
+        if contents is None:
+            continue
+        content_hash = hashlib.sha1(contents).hexdigest()
+        cached = cached_file_result(path, content_hash)
+        if cached:
+            results[path] = cached
+        else:
+            stale[path] = content_hash
+
+    total = len(results) + len(stale)
+    if on_progress:
+        on_progress(len(results), total)
+
+    def finish(path, result):
+        store_file_result(path, stale[path], result)
+        results[path] = result
+        if on_progress:
+            on_progress(len(results), total)
+
+    paths = sorted(stale)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        if paths and supports_batch_coverage(bin):
+            batches = [
+                paths[i:i + BATCH_SIZE]
+                for i in range(0, len(paths), BATCH_SIZE)
+            ]
+            futures = [
+                (batch, pool.submit(batch_coverage, bin, root, batch))
+                for batch in batches
+            ]
+            for batch, future in futures:
+                try:
+                    batch_results = future.result()
+                except (ValueError, KeyError, OSError) as e:
+                    print('Flow coverage failed for {} files from {}: {}'
+                          .format(len(batch), batch[0], e))
+                    continue
+                for path, result in batch_results.items():
+                    if path in stale:
+                        finish(path, result)
+        else:
+            futures = [
+                (path, pool.submit(read_file_coverage, bin, root, path))
+                for path in paths
+            ]
+            for path, future in futures:
+                try:
+                    finish(path, future.result())
+                except (ValueError, KeyError, OSError) as e:
+                    print('Flow coverage failed for {}: {}'.format(path, e))
+
+    return results
+
+
+def percent(covered, uncovered):
+    total = covered + uncovered
+    return 100.0 * covered / total if total else 100.0
+
+
+def summarize(root, results):
+    directories = {}
+    for path, result in results.items():
+        directory = os.path.relpath(os.path.dirname(path), root)
+        row = directories.setdefault(directory, {
+            'path': directory, 'files': 0, 'covered': 0, 'uncovered': 0
+        })
+        row['files'] += 1
+        row['covered'] += result['covered']
+        row['uncovered'] += result['uncovered']
+
+    rows = list(directories.values())
+    for row in rows:
+        row['percent'] = percent(row['covered'], row['uncovered'])
+    return rows
+
+
+def format_report(root, results, sort_by='path'):
+    rows = sorted(summarize(root, results), key=SORT_KEYS[sort_by])
+    covered = sum(row['covered'] for row in rows)
+    uncovered = sum(row['uncovered'] for row in rows)
+
+    lines = [
+        'Flow coverage for {}'.format(root),
+        '{} files, {:.1f}% of expressions covered, sorted by {}'.format(
+            len(results), percent(covered, uncovered), sort_by
+        ),
+        '',
+        '{:>8}  {:>6}  {:>9}  {:>9}  {}'.format(
+            'coverage', 'files', 'covered', 'uncovered', 'directory'
+        )
+    ]
+    for row in rows:
+        lines.append('{:>7.1f}%  {:>6}  {:>9}  {:>9}  {}'.format(
+            row['percent'], row['files'], row['covered'], row['uncovered'],
+            row['path']
+        ))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,106 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+from .cache import file_mtime
+from .cli import CLI
+from .prefetch import prefetch_nearby
+from .state import view_state
+
+
+PREFETCH_CHANNEL = 'definition-prefetch'
+PREREAD_CHUNK = 1024 * 1024
+PREREAD_LIMIT = 256
+
+# path -> a number that changes whenever an open view of it is modified,
+# so definitions into a file notice edits that aren't saved yet. Paths
+# are forgotten when their views close; the numbers are never reused.
+_target_edits = {}
+_edit_numbers = itertools.count(1)
+# (path, mtime) of the target files most recently read ahead
+_preread = OrderedDict()
+_preread_lock = threading.Lock()
+
+
+def target_changed(path):
+    if path:
+        _target_edits[path] = next(_edit_numbers)
+
+
+def forget_target(path):
+    _target_edits.pop(path, None)
+
+
+def target_version(path):
+    if not path:
+        return None
+    return (file_mtime(path), _target_edits.get(path, 0))
+
+
+def definition_cache(view):
+    # Definitions are cached per token span and only for the current
+    # revision, each with the version of the file it points into
+    state = view_state(view)
+    revision = view.change_count()
+    if state.definition_revision != revision:
+        state.definition_revision = revision
+        state.definitions = {}
+    return state.definitions
+
+
+# Stats the target file, so it's only called off the UI thread
+def cached_definition(view, span):
+    cache = definition_cache(view)
+    entry = cache.get(span)
+    if entry is None:
+        return None
+    result, version = entry
+    if target_version(result.get('path')) != version:
+        del cache[span]
+        return None
+    return result
+
+
+def store_definition(view, revision, span, result):
+    if not result or view.change_count() != revision:
+        return
+    path = result.get('path')
+    definition_cache(view)[span] = (result, target_version(path))
+    if path:
+        preread(path)
+
+
+def preread(path):
+    # Reading the target ahead of the jump gets it into the OS cache, which
+    # matters most for large files on network mounts
+    key = (path, file_mtime(path))
+    with _preread_lock:
+        if key in _preread:
+            _preread.move_to_end(key)
+            return
+        _preread[key] = True
+        if len(_preread) > PREREAD_LIMIT:
+            _preread.popitem(last=False)
+
+    def read():
+        try:
+            with open(path, 'rb') as f:
+                while f.read(PREREAD_CHUNK):
+                    pass
+        except OSError:
+            pass
+
+    thread = threading.Thread(target=read)
+    thread.daemon = True
+    thread.start()
+
+
+def query_definition(view, span, **kwargs):
+    return CLI(view).get_def(point=span[0], **kwargs)
+
+
+def prefetch_definitions(view, budget):
+    prefetch_nearby(
+        view, budget, definition_cache(view), query_definition,
+        store_definition, PREFETCH_CHANNEL
+    )
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from .cache import root_fingerprint
+from .paths import cached_fingerprint
+from .process import run_flow
+
+
+DISK_CACHED_COMMANDS = ('check-contents', 'coverage')
+CACHE_FILE = 'results.jsonl'
+DEFAULT_SIZE_MB = 32
+DEFAULT_MAX_BYTES = DEFAULT_SIZE_MB * 1024 * 1024
+
+# New results are written once none has come in for this long
+FLUSH_DELAY = 5.0
+
+_flow_versions = {}
+_config_hashes = {}
+
+
+# Both are looked up through the root's cached fingerprint, so they cost
+# no stat or PATH search per query. Running `flow version` the first time
+# a binary is seen blocks, so neither belongs on Sublime's threads.
+def flow_version(bin, root):
+    # Keyed on the binary's resolved path and mtime, so an upgrade is
+    # noticed
+    key = cached_fingerprint(root, bin, root_fingerprint)[1:]
+    if key not in _flow_versions:
+        version = None
+        try:
+            returncode, output = run_flow([bin, 'version', '--json'], '')
+            if not returncode:
+                version = json.loads(output.decode('utf-8')).get('semver')
+        except (OSError, ValueError):
+            pass
+        _flow_versions[key] = version or '{}@{}'.format(*key)
+    return _flow_versions[key]
+
+
+def config_hash(root, bin):
+    path = os.path.join(root, '.flowconfig')
+    mtime = cached_fingerprint(root, bin, root_fingerprint)[0]
+    cached = _config_hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        digest = None
+    _config_hashes[path] = (mtime, digest)
+    return digest
+
+
+# Decoded check and coverage results, kept across editor restarts in an
+# append-only JSON lines file. Later lines win; once the file outgrows
+# max_bytes it is rewritten with the most recent half. Results are held
+# in memory until typing pauses, so a burst of them is one write.
+class DiskCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # key -> (result, size of its line in the file, None until written)
+        self.entries = None
+        self.size = 0
+        self.unwritten = OrderedDict()
+        self.flush_timer = None
+        self.lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, CACHE_FILE)
+
+    def set_directory(self, directory):
+        with self.lock:
+            if directory != self.directory:
+                self.directory = directory
+                self.entries = None
+                self.unwritten = OrderedDict()
+
+    def resize(self, max_bytes):
+        self.max_bytes = max_bytes
+
+    def key(self, command, bin, root, path, content_hash):
+        if command not in DISK_CACHED_COMMANDS or not (bin and root):
+            return None
+        return (
+            flow_version(bin, root), config_hash(root, bin), path,
+            content_hash, command
+        )
+
+    def load(self):
+        # Called with the lock held
+        if self.entries is not None:
+            return
+        self.entries = OrderedDict()
+        self.size = 0
+        damaged = False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        key = tuple(entry['key'])
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short by a crash
+                        damaged = True
+                        continue
+                    line_size = len(line.encode('utf-8'))
+                    self.entries.pop(key, None)
+                    self.entries[key] = (entry['result'], line_size)
+                    self.size += line_size
+        except OSError:
+            pass
+        if self.size > self.max_bytes:
+            self.compact()
+        elif damaged:
+            # Rewritten, so new lines aren't appended to a broken one
+            self.compact(self.max_bytes)
+
+    def get(self, key):
+        if not key or not self.directory:
+            return None
+        with self.lock:
+            self.load()
+            entry = self.entries.get(key)
+        return entry[0] if entry else None
+
+    def put(self, key, result):
+        if not key or not self.directory:
+            return
+        with self.lock:
+            self.load()
+            self.entries.pop(key, None)
+            self.entries[key] = (result, None)
+            self.unwritten.pop(key, None)
+            self.unwritten[key] = True
+            if self.flush_timer:
+                self.flush_timer.cancel()
+            self.flush_timer = threading.Timer(FLUSH_DELAY, self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.flush_timer:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if not self.unwritten or self.entries is None:
+                return
+            lines = []
+            for key in self.unwritten:
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                line = json.dumps({'key': key, 'result': entry[0]}) + '\n'
+                line_size = len(line.encode('utf-8'))
+                self.entries[key] = (entry[0], line_size)
+                self.size += line_size
+                lines.append(line)
+            self.unwritten = OrderedDict()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+            except OSError as e:
+                print('Could not write the Flow result cache: ' + str(e))
+                return
+            if self.size > self.max_bytes:
+                self.compact()
+
+    def compact(self, limit=None):
+        # Called with the lock held; keeps the most recent results that
+        # fit in `limit` bytes, half the maximum by default
+        if limit is None:
+            limit = self.max_bytes // 2
+        kept = []
+        size = 0
+        for key, (result, line_size) in reversed(self.entries.items()):
+            if size + line_size > limit:
+                break
+            kept.append((key, result))
+            size += line_size
+        kept.reverse()
+
+        self.entries = OrderedDict()
+        self.size = 0
+        temporary = self.path + '.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary, 'w', encoding='utf-8') as f:
+                for key, result in kept:
+                    line = json.dumps({'key': key, 'result': result}) + '\n'
+                    f.write(line)
+                    line_size = len(line.encode('utf-8'))
+                    self.entries[key] = (result, line_size)
+                    self.size += line_size
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print('Could not compact the Flow result cache: ' + str(e))
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.size = 0
+            self.unwritten = OrderedDict()
+            if self.directory:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+
+
+disk_cache = DiskCache()
@@ -0,0 +1,131 @@
+from bisect import bisect_left, bisect_right
+
+
+def error_locations(error):
+    locations = []
+
+    operation = error.get('operation')
+    if operation:
+        row = int(operation['line']) - 1
+        col = int(operation['start']) - 1
+        endcol = int(operation['end'])
+        locations.append((row, col, row, endcol))
+
+    for message in error['message']:
+        row = int(message['line']) - 1
+        col = int(message['start']) - 1
+        endcol = int(message['end'])
+        locations.append((row, col, row, endcol))
+
+    return locations
+
+
+def uncovered_locations(result):
+    locations = []
+
+    for line in result['expressions']['uncovered_locs']:
+        start = line['start']
+        end = line['end']
+        row = int(start['line']) - 1
+        col = int(start['column']) - 1
+        endrow = int(end['line']) - 1
+        endcol = int(end['column'])
+        locations.append((row, col, endrow, endcol))
+
+    return locations
+
+
+def error_description(error):
+    return ' '.join(
+        message['descr'] for message in error['message']
+    )
+
+
+# Check results as parallel arrays sorted by start point, so the errors
+# under a point or a line are found by bisection rather than by
+# rebuilding per-row strings.
+class ErrorIndex:
+    def __init__(self, entries, descriptions):
+        entries.sort()
+        self.starts = [entry[0] for entry in entries]
+        self.ends = [entry[1] for entry in entries]
+        self.error_ids = [entry[2] for entry in entries]
+        self.descriptions = descriptions
+
+        # A segment tree over the spans in start order: node i holds the
+        # furthest end of the spans below it, leaves start at self.leaves.
+        # A long span early on then only costs its own branch in lookups.
+        self.leaves = 1
+        while self.leaves < len(self.ends):
+            self.leaves *= 2
+        self.furthest = [-1] * (2 * self.leaves)
+        self.furthest[self.leaves:self.leaves + len(self.ends)] = self.ends
+        for node in range(self.leaves - 1, 0, -1):
+            self.furthest[node] = max(
+                self.furthest[2 * node], self.furthest[2 * node + 1]
+            )
+
+    @classmethod
+    def from_errors(cls, errors, text_point):
+        entries = []
+        descriptions = []
+        for error_id, error in enumerate(errors):
+            descriptions.append(error_description(error))
+            for row, col, endrow, endcol in error_locations(error):
+                entries.append((
+                    text_point(row, col),
+                    text_point(endrow, endcol),
+                    error_id
+                ))
+        return cls(entries, descriptions)
+
+    def __len__(self):
+        return len(self.descriptions)
+
+    def spans(self):
+        return sorted(set(zip(self.starts, self.ends)))
+
+    def errors_in(self, begin, end):
+        # Ids of errors with a span touching [begin, end], in order
+        found = []
+        # Spans starting at or before `end` are leaves [0, last)
+        last = bisect_right(self.starts, end)
+        stack = [(1, 0, self.leaves)]
+        while stack:
+            node, low, high = stack.pop()
+            if low >= last or self.furthest[node] < begin:
+                continue
+            if node >= self.leaves:
+                found.append(self.error_ids[low])
+                continue
+            middle = (low + high) // 2
+            stack.append((2 * node + 1, middle, high))
+            stack.append((2 * node, low, middle))
+
+        seen = set()
+        ordered = []
+        for error_id in sorted(found):
+            if error_id not in seen:
+                seen.add(error_id)
+                ordered.append(error_id)
+        return ordered
+
+    def errors_at(self, point):
+        return self.errors_in(point, point)
+
+    def describe(self, error_ids):
+        return '; '.join(self.descriptions[error_id] for error_id in error_ids)
+
+    def next_span(self, point):
+        if not self.starts:
+            return None
+        index = bisect_right(self.starts, point)
+        if index == len(self.starts):
+            index = 0
+        return self.starts[index], self.ends[index]
+
+    def previous_span(self, point):
+        if not self.starts:
+            return None
+        index = bisect_left(self.starts, point) - 1
+        return self.starts[index], self.ends[index]
@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+from .scheduler import QueryCancelled
+
+
+PRIORITY_AUTOCOMPLETE = 0
+PRIORITY_NAVIGATION = 1
+PRIORITY_CHECK = 2
+PRIORITY_COVERAGE = 3
+PRIORITY_PREFETCH = 4
+
+COMMAND_PRIORITIES = {
+    'autocomplete': PRIORITY_AUTOCOMPLETE,
+    'type-at-pos': PRIORITY_NAVIGATION,
+    'get-def': PRIORITY_NAVIGATION,
+    'check-contents': PRIORITY_CHECK,
+    'coverage': PRIORITY_COVERAGE,
+}
+
+DEFAULT_CONCURRENCY = 2
+MAX_WORKERS = 8
+
+# Background queries beyond this many per root, queued or running, are
+# dropped rather than piling up behind a slow server
+DEFAULT_MAX_PENDING = 8
+
+
+class TooManyQueries(QueryCancelled):
+    pass
+
+
+def completed_future(result=None, exception=None):
+    future = Future()
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+    return future
+
+
+def chain_future(source, target):
+    # Settles `target` like `source` once it is done
+    def copy(source):
+        if source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+    source.add_done_callback(copy)
+
+
+class QueryJob:
+    def __init__(self, priority, root, fn, token):
+        self.priority = priority
+        self.root = root
+        self.fn = fn
+        self.token = token
+        self.future = Future()
+
+
+# Runs Flow queries off Sublime's async thread, highest priority first,
+# with at most `concurrency` queries running per Flow root.
+class QueryExecutor:
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY,
+                 max_workers=MAX_WORKERS):
+        self.concurrency = concurrency
+        self.max_workers = max_workers
+        self.queue = []
+        self.sequence = itertools.count()
+        self.running = {}
+        # Checks and coverage among the running queries
+        self.background = {}
+        self.workers = 0
+        self.idle = 0
+        self.stopped = False
+        self.condition = threading.Condition()
+
+    def submit(self, priority, root, fn, token=None):
+        job = QueryJob(priority, root, fn, token)
+        with self.condition:
+            heapq.heappush(
+                self.queue, (priority, next(self.sequence), job)
+            )
+            if not self.idle and self.workers < self.max_workers:
+                self.start_worker()
+            self.condition.notify()
+        return job.future
+
+    def pending(self, root):
+        with self.condition:
+            queued = sum(
+                1 for entry in self.queue
+                if entry[2].root == root and not (
+                    entry[2].token and entry[2].token.cancelled
+                )
+            )
+            return queued + self.running.get(root, 0)
+
+    def set_concurrency(self, concurrency):
+        with self.condition:
+            self.concurrency = concurrency
+            self.condition.notify_all()
+
+    def shutdown(self):
+        with self.condition:
+            self.stopped = True
+            dropped = [entry[2] for entry in self.queue]
+            self.queue = []
+            self.condition.notify_all()
+        for job in dropped:
+            job.future.set_exception(QueryCancelled('FlowIDE was unloaded.'))
+
+    def start_worker(self):
+        self.workers += 1
+        worker = threading.Thread(target=self.work)
+        worker.daemon = True
+        worker.start()
+
+    def has_capacity(self, job):
+        limit = max(self.concurrency, 1)
+        running = self.running.get(job.root, 0)
+        # Checks and coverage never take the last slot, so autocomplete
+        # and navigation don't wait behind them. With a single slot, one
+        # interactive query may run beside the check or coverage holding it.
+        if job.priority >= PRIORITY_CHECK:
+            return running < max(limit - 1, 1)
+        interactive = running - self.background.get(job.root, 0)
+        return interactive < limit and running < max(limit, 2)
+
+    def take_job(self, dropped):
+        deferred = []
+        job = None
+        while self.queue:
+            entry = heapq.heappop(self.queue)
+            candidate = entry[2]
+            if candidate.token and candidate.token.cancelled:
+                dropped.append(candidate)
+                continue
+            if self.has_capacity(candidate):
+                job = candidate
+                break
+            deferred.append(entry)
+
+        for entry in deferred:
+            heapq.heappush(self.queue, entry)
+        return job
+
+    def work(self):
+        while True:
+            dropped = []
+            with self.condition:
+                self.idle += 1
+                job = self.take_job(dropped)
+                while job is None and not dropped and not self.stopped:
+                    self.condition.wait()
+                    job = self.take_job(dropped)
+                self.idle -= 1
+
+                if self.stopped and job is None and not dropped:
+                    self.workers -= 1
+                    return
+                if job:
+                    self.running[job.root] = \
+                        self.running.get(job.root, 0) + 1
+                    if job.priority >= PRIORITY_CHECK:
+                        self.background[job.root] = \
+                            self.background.get(job.root, 0) + 1
+
+            for cancelled in dropped:
+                cancelled.future.set_exception(
+                    QueryCancelled('Superseded before it started.')
+                )
+            if job:
+                self.run(job)
+
+    def run(self, job):
+        try:
+            result = job.fn()
+        except BaseException as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+        finally:
+            with self.condition:
+                self.running[job.root] -= 1
+                if not self.running[job.root]:
+                    del self.running[job.root]
+                if job.priority >= PRIORITY_CHECK:
+                    self.background[job.root] -= 1
+                    if not self.background[job.root]:
+                        del self.background[job.root]
+                self.condition.notify_all()
+
+
+query_executor = QueryExecutor()
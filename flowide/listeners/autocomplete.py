@@ -1,15 +1,30 @@
 import sublime
 import sublime_plugin
 
-from ..cli import CLI, InvalidContext
-from ..settings import find_flow_settings
+from ..cli import CLI
+from ..completions import CompletionSet, completion_entries
+from ..query import InvalidContext
+from ..scheduler import QueryCancelled
+from ..settings import view_settings
 from ..util import wait_for_load
-from ..view import build_snippet, display_unknown_error
+from ..view import display_unknown_error, when_done
+
+
+def completion_anchor(view, prefix, locations):
+    location = locations[0]
+    token_start = location - len(prefix)
+    line_start = view.line(location).begin()
+    return (
+        view.id(),
+        line_start,
+        token_start,
+        view.substr(sublime.Region(line_start, token_start))
+    )
 
 
 class FlowAutocompleteListener(sublime_plugin.EventListener):
-    completions = None
-    completions_ready = False
+    completion_set = None
+    pending_anchor = None
 
     # Used for async completions.
     def run_auto_complete(self):
@@ -21,22 +36,35 @@ class FlowAutocompleteListener(sublime_plugin.EventListener):
         })
 
     def on_query_completions(self, view, prefix, locations):
-        # Return the pending completions and clear them
-        if self.completions_ready and self.completions:
-            self.completions_ready = False
-            return self.completions
+        # Typing more of the same identifier filters the last results
+        # locally; Flow is only asked again when the anchor moves
+        anchor = completion_anchor(view, prefix, locations)
+        completion_set = self.completion_set
+        if completion_set and completion_set.matches(anchor, prefix):
+            return (completion_set.filter(prefix), completion_set.flags)
+
+        if anchor == self.pending_anchor:
+            return
+        self.pending_anchor = anchor
 
         sublime.set_timeout_async(
-            lambda: self.on_query_completions_async(
-                view, prefix, locations
-            )
+            lambda: self.on_query_completions_async(view, prefix, anchor)
         )
 
     @wait_for_load
-    def on_query_completions_async(self, view, prefix, locations):
-        self.completions = None
+    def on_query_completions_async(self, view, prefix, anchor):
+        when_done(
+            CLI(view).autocomplete(),
+            lambda future: self.on_autocomplete_result(
+                view, prefix, anchor, future
+            )
+        )
 
-        flow_settings = find_flow_settings(view.window().project_data())
+    def on_autocomplete_result(self, view, prefix, anchor, future):
+        if self.pending_anchor == anchor:
+            self.pending_anchor = None
+
+        flow_settings = view_settings(view)
         autocomplete_flags = sublime.INHIBIT_WORD_COMPLETIONS | \
             sublime.INHIBIT_EXPLICIT_COMPLETIONS
         if flow_settings.get('show_sublime_autocomplete_suggestions'):
@@ -44,36 +72,26 @@ class FlowAutocompleteListener(sublime_plugin.EventListener):
 
         result = None
         try:
-            result = CLI(view).autocomplete()
+            result = future.result()
+        except QueryCancelled:
+            return
         except InvalidContext:
             pass
         except Exception as e:
-            display_unknown_error(self.view, e)
+            display_unknown_error(view, e)
 
         if not result:
             return
 
-        self.completions = (
-            [
-                (
-                    # matching text
-                    match['name'] + '\t' + match['type'],
-                    # inserted text
-                    build_snippet(
-                        match['name'],
-                        match.get('func_details')['params']
-                    )
-                    if (
-                        match.get('func_details') and
-                        not flow_settings.get('omit_function_parameters')
-                    )
-                    else match['name']
-                )
-                for match in result['result']
-            ],
+        self.completion_set = CompletionSet(
+            anchor,
+            prefix,
+            completion_entries(
+                result['result'],
+                flow_settings.get('omit_function_parameters')
+            ),
             autocomplete_flags
         )
-        self.completions_ready = True
         sublime.active_window().active_view().run_command(
             'hide_auto_complete'
         )
@@ -1,92 +1,196 @@
+import html
 import sublime
 import sublime_plugin
 
-from ..cli import CLI, InvalidContext
+from ..adaptive_delay import adaptive_delay
+from ..buffer import discard_buffer_snapshot
+from ..cache import result_cache
+from ..cli import CLI
+from ..errors import ErrorIndex
+from ..paths import find_flow_config
+from ..query import InvalidContext
+from ..scheduler import QueryCancelled, request_scheduler
+from ..state import discard_view_state, invalidate_view_state, view_state
 from ..util import debounce, wait_for_load
-from ..view import rowcol_to_region, display_unknown_error
+from ..view import (
+    buffer_views,
+    display_unknown_error,
+    erase_regions,
+    render_regions,
+    resume_viewport_fill,
+    view_snapshot,
+    when_done
+)
+
+
+def set_error_status(view, state):
+    if not state.error_count_text:
+        return
+
+    error_for_row = None
+    if state.error_index:
+        line = view.line(view.sel()[0].begin())
+        error_for_row = state.error_index.describe(
+            state.error_index.errors_in(line.begin(), line.end())
+        )
+    if error_for_row:
+        view.set_status(
+            'flow_error', state.error_count_text + ': ' + error_for_row
+        )
+    else:
+        view.set_status('flow_error', state.error_count_text)
+
+
+def show_check_result(view, revision, error_count_text, error_index):
+    if error_index:
+        render_regions(
+            view, 'flow_error', error_index.spans(),
+            'scope.js', 'dot', sublime.DRAW_NO_FILL
+        )
+    else:
+        erase_regions(view, 'flow_error')
+
+    state = view_state(view)
+    state.check_revision = revision
+    state.error_count_text = error_count_text
+    state.error_index = error_index
+    set_error_status(view, state)
 
 
 class FlowCheckListener(sublime_plugin.EventListener):
     def on_selection_modified_async(self, view):
         self.view = view
+
+        # The cursor moved but the buffer didn't change: answer
+        # from the last result instead of asking Flow again
+        state = view_state(view)
+        if state.check_revision == view.change_count():
+            set_error_status(view, state)
+            return
+
         sublime.set_timeout_async(
             lambda: self.run_check(view)
         )
 
+    def on_hover(self, view, point, hover_zone):
+        state = view_state(view)
+        if (
+            not state.error_index or
+            state.check_revision != view.change_count()
+        ):
+            return
+
+        if hover_zone == sublime.HOVER_GUTTER:
+            line = view.line(point)
+            error_ids = state.error_index.errors_in(line.begin(), line.end())
+        elif hover_zone == sublime.HOVER_TEXT:
+            error_ids = state.error_index.errors_at(point)
+        else:
+            return
+
+        if not error_ids:
+            return
+
+        view.show_popup(
+            '<br>'.join(
+                html.escape(state.error_index.descriptions[error_id])
+                for error_id in error_ids
+            ),
+            sublime.HIDE_ON_MOUSE_MOVE_AWAY,
+            point,
+            600
+        )
+
+    def on_load_async(self, view):
+        self.show_last_known(view)
+
+    def on_activated_async(self, view):
+        # Other files may have changed while this view was in the background
+        invalidate_view_state(view)
+        resume_viewport_fill(view)
+        self.show_last_known(view)
+
+    def on_post_save_async(self, view):
+        # Saving can change the errors of every file that depends on it
+        result_cache.invalidate_root(find_flow_config(view.file_name()))
+        invalidate_view_state(view)
+
+    def on_close(self, view):
+        request_scheduler.cancel_view(view.id())
+        adaptive_delay.forget_view(view.id())
+        discard_buffer_snapshot(view.buffer_id())
+        discard_view_state(view)
+
     @wait_for_load
-    @debounce
+    @debounce('check-contents')
     def run_check(self, view):
+        revision = view.change_count()
+        when_done(
+            CLI(view).check_contents(),
+            lambda future: self.on_check_result(view, revision, future)
+        )
+
+    def on_check_result(self, view, revision, future):
         result = None
         try:
-            result = CLI(view).check_contents()
+            result = future.result()
+        except QueryCancelled:
+            return
         except InvalidContext:
-            view.erase_regions('flow_error')
-            view.erase_regions('flow_uncovered')
+            for clone in buffer_views(view):
+                erase_regions(clone, 'flow_error')
+                erase_regions(clone, 'flow_uncovered')
+                state = view_state(clone)
+                state.check_revision = revision
+                state.error_count_text = None
+                state.error_index = None
         except Exception as e:
-            display_unknown_error(self.view, e)
+            display_unknown_error(view, e)
 
-        if not result:
-            return
+        if result:
+            self.render_check_result(view, revision, result)
 
+    def render_check_result(self, view, revision, result):
         if result.get('passed'):
-            view.erase_regions('flow_error')
-            view.set_status('flow_error', 'Flow: no errors')
+            error_index = None
+            error_count_text = 'Flow: no errors'
+        else:
+            error_index = ErrorIndex.from_errors(
+                result['errors'], view_snapshot(view).text_point
+            )
+            error_count = len(result['errors'])
+            error_count_text = 'Flow: {} error{}'.format(
+                error_count, '' if error_count is 1 else 's'
+            )
+
+        # Clones and split views of the file show the same result
+        for clone in buffer_views(view):
+            show_check_result(clone, revision, error_count_text, error_index)
+
+    def show_last_known(self, view):
+        state = view_state(view)
+        if (
+            view.is_loading() or not view.file_name() or
+            'check-contents' in state.restored
+        ):
             return
+        state.restored.add('check-contents')
 
-        regions = []
-        description_by_row = {}
-
-        for error in result['errors']:
-            rows = []
-            description = ''
-
-            operation = error.get('operation')
-            if operation:
-                row = int(operation['line']) - 1
-                col = int(operation['start']) - 1
-                endcol = int(operation['end'])
-                regions.append(
-                    rowcol_to_region(view, row, col, endcol)
-                )
-                rows.append(row)
-
-            for message in error['message']:
-                row = int(message['line']) - 1
-                col = int(message['start']) - 1
-                endcol = int(message['end'])
-                regions.append(
-                    rowcol_to_region(view, row, col, endcol)
-                )
-                rows.append(row)
-
-                description += message['descr'] + ' '
-
-            for row in rows:
-                row_description = description_by_row.get(row)
-                if not row_description:
-                    description_by_row[row] = description
-                if (
-                    row_description and
-                    description not in row_description
-                ):
-                    description_by_row[row] += '; ' + description
-
-        view.add_regions(
-            'flow_error', regions, 'scope.js', 'dot',
-            sublime.DRAW_NO_FILL
+        revision = view.change_count()
+        when_done(
+            CLI(view).last_known_result(name='check-contents'),
+            lambda future: self.on_last_known(view, revision, future)
         )
 
-        error_count = len(result['errors'])
-        error_count_text = 'Flow: {} error{}'.format(
-            error_count, '' if error_count is 1 else 's'
-        )
+    def on_last_known(self, view, revision, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print('Could not read the Flow result cache: ' + str(e))
+            return
+        if not result or view.change_count() != revision:
+            return
 
-        cursor_pos = view.sel()[0].begin()
-        row, _ = view.rowcol(cursor_pos)
-        error_for_row = description_by_row.get(row)
-        if error_for_row:
-            view.set_status(
-                'flow_error', error_count_text + ': ' + error_for_row
-            )
-        else:
-            view.set_status('flow_error', error_count_text)
+        # Shown without a revision, so it is replaced once Flow answers
+        self.render_check_result(view, None, result)
+        self.run_check(view)
@@ -1,60 +1,116 @@
 import sublime
 import sublime_plugin
 
-from ..cli import CLI, InvalidContext
-from ..settings import find_flow_settings
+from ..cli import CLI
+from ..errors import uncovered_locations
+from ..query import InvalidContext
+from ..scheduler import QueryCancelled
+from ..settings import view_settings
+from ..state import view_state
 from ..util import debounce, wait_for_load
-from ..view import rowcol_to_region, display_unknown_error
+from ..view import (
+    buffer_views,
+    display_unknown_error,
+    erase_regions,
+    locations_to_spans,
+    render_regions,
+    when_done
+)
 
 
 class FlowCoverageListener(sublime_plugin.EventListener):
     def on_selection_modified_async(self, view):
         self.view = view
+
+        # Coverage regions and status don't depend on the cursor
+        if view_state(view).coverage_revision == view.change_count():
+            return
+
         sublime.set_timeout_async(
             lambda: self.run_coverage(view)
         )
 
+    def on_load_async(self, view):
+        self.show_last_known(view)
+
+    def on_activated_async(self, view):
+        self.show_last_known(view)
+
+    def show_last_known(self, view):
+        state = view_state(view)
+        if (
+            view.is_loading() or not view.file_name() or
+            'coverage' in state.restored
+        ):
+            return
+        state.restored.add('coverage')
+        if not view_settings(view).get('show_coverage'):
+            return
+
+        revision = view.change_count()
+        when_done(
+            CLI(view).last_known_result(name='coverage'),
+            lambda future: self.on_last_known(view, revision, future)
+        )
+
+    def on_last_known(self, view, revision, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print('Could not read the Flow result cache: ' + str(e))
+            return
+        if not result or view.change_count() != revision:
+            return
+
+        # Shown without a revision, so it is replaced once Flow answers
+        self.render_coverage_result(view, None, result)
+        self.run_coverage(view)
+
     @wait_for_load
-    @debounce
+    @debounce('coverage')
     def run_coverage(self, view):
-        settings = find_flow_settings(view.window().project_data())
+        settings = view_settings(view)
         if not settings.get('show_coverage'):
             return
 
+        revision = view.change_count()
+        when_done(
+            CLI(view).coverage(),
+            lambda future: self.on_coverage_result(view, revision, future)
+        )
+
+    def on_coverage_result(self, view, revision, future):
         result = None
         try:
-            result = CLI(view).coverage()
+            result = future.result()
+        except QueryCancelled:
+            return
         except InvalidContext:
-            view.erase_regions('flow_error')
-            view.erase_regions('flow_uncovered')
+            for clone in buffer_views(view):
+                erase_regions(clone, 'flow_error')
+                erase_regions(clone, 'flow_uncovered')
+                view_state(clone).coverage_revision = revision
         except Exception as e:
-            display_unknown_error(self.view, e)
+            display_unknown_error(view, e)
 
-        if not result:
-            return
-
-        regions = []
-
-        for line in result['expressions']['uncovered_locs']:
-            start = line['start']
-            end = line['end']
-            row = int(start['line']) - 1
-            col = int(start['column']) - 1
-            endrow = int(end['line']) - 1
-            endcol = int(end['column'])
-            regions.append(
-                rowcol_to_region(view, row, col, endcol, endrow)
-            )
-
-        view.add_regions(
-            'flow_uncovered', regions, 'comment', '',
-            sublime.DRAW_STIPPLED_UNDERLINE +
-            sublime.DRAW_NO_FILL +
-            sublime.DRAW_NO_OUTLINE
-        )
+        if result:
+            self.render_coverage_result(view, revision, result)
 
+    def render_coverage_result(self, view, revision, result):
+        spans = locations_to_spans(view, uncovered_locations(result))
         uncovered_count = result['expressions']['uncovered_count']
         covered_count_text = 'Flow coverage: {} line{} uncovered'.format(
             uncovered_count, '' if uncovered_count is 1 else 's'
         )
-        view.set_status('flow_coverage', covered_count_text)
+
+        # Clones and split views of the file show the same result
+        for clone in buffer_views(view):
+            render_regions(
+                clone, 'flow_uncovered', spans,
+                'comment', '',
+                sublime.DRAW_STIPPLED_UNDERLINE +
+                sublime.DRAW_NO_FILL +
+                sublime.DRAW_NO_OUTLINE
+            )
+            clone.set_status('flow_coverage', covered_count_text)
+            view_state(clone).coverage_revision = revision
@@ -0,0 +1,32 @@
+import sublime_plugin
+
+from ..definitions import (
+    PREFETCH_CHANNEL,
+    forget_target,
+    prefetch_definitions,
+    target_changed
+)
+from ..scheduler import request_scheduler
+from ..settings import view_settings
+from ..util import debounce, wait_for_load
+
+
+class FlowDefinitionPrefetchListener(sublime_plugin.EventListener):
+    def on_selection_modified_async(self, view):
+        if view_settings(view).get('definition_prefetch_budget'):
+            self.run_prefetch(view)
+
+    def on_modified_async(self, view):
+        request_scheduler.cancel((view.id(), PREFETCH_CHANNEL))
+        # Definitions other views resolved into this file may have moved
+        target_changed(view.file_name())
+
+    def on_close(self, view):
+        forget_target(view.file_name())
+
+    @wait_for_load
+    @debounce()
+    def run_prefetch(self, view):
+        prefetch_definitions(
+            view, view_settings(view).get('definition_prefetch_budget')
+        )
@@ -0,0 +1,74 @@
+import os
+import sublime_plugin
+
+from ..coverage_report import JS_EXTENSIONS
+from ..paths import clear_resolution_cache, find_flow_bin, find_flow_config
+from ..project_errors import project_diagnostics_for
+from ..settings import clear_settings_snapshots, view_settings
+from ..symbols import symbol_indexes
+
+
+RESOLUTION_FILES = ('.flowconfig', 'package.json')
+
+
+def on_project_changed(window):
+    clear_settings_snapshots(window)
+    clear_resolution_cache()
+
+
+class FlowProjectListener(sublime_plugin.EventListener):
+    project_files = {}
+
+    def on_post_save_async(self, view):
+        filename = view.file_name()
+        if not filename:
+            return
+
+        # Saving makes the server recheck, so project errors change
+        diagnostics = project_diagnostics_for(filename)
+        if diagnostics:
+            diagnostics.refresh()
+
+        # Only indexes already in use are kept up to date
+        root = find_flow_config(filename)
+        index = symbol_indexes.existing(root)
+        if index and index.loaded and filename.endswith(JS_EXTENSIONS):
+            index.queue_update(
+                find_flow_bin(root, view_settings(view)), filename
+            )
+
+        basename = os.path.basename(filename)
+        if basename.endswith('.sublime-project'):
+            clear_settings_snapshots()
+            clear_resolution_cache()
+        elif basename in RESOLUTION_FILES:
+            clear_resolution_cache()
+
+    def on_load_async(self, view):
+        diagnostics = project_diagnostics_for(view.file_name())
+        if diagnostics:
+            diagnostics.render_gutter(view)
+
+    def on_activated_async(self, view):
+        # Sublime Text 3 has no project events, so notice a window
+        # switching projects when one of its views is focused
+        window = view.window()
+        if not window:
+            return
+
+        project_file = window.project_file_name()
+        if self.project_files.get(window.id(), project_file) != project_file:
+            on_project_changed(window)
+        self.project_files[window.id()] = project_file
+
+    # The events below only exist in Sublime Text 4
+
+    def on_load_project_async(self, window):
+        on_project_changed(window)
+
+    def on_post_save_project_async(self, window):
+        on_project_changed(window)
+
+    def on_pre_close_window(self, window):
+        clear_settings_snapshots(window)
+        self.project_files.pop(window.id(), None)
@@ -0,0 +1,90 @@
+import sublime
+import sublime_plugin
+
+from ..breaker import circuit_breaker
+from ..coverage_report import DEFAULT_WORKERS
+from ..paths import find_flow_bin, find_flow_config
+from ..project_errors import is_under
+from ..servers import server_registry
+from ..settings import view_settings
+from ..symbols import symbol_indexes
+from ..util import wait_for_load
+
+
+STATUS_KEY = 'flow_server'
+STATUS_TEXT = {
+    'initializing': 'Flow: starting server',
+    'rechecking': 'Flow: rechecking',
+}
+FLOW_PRAGMA = r'@flow\b'
+
+HEALTH_STATUS_KEY = 'flow_health'
+HEALTH_STATUS_TEXT = {
+    'open': 'Flow: not responding, background checks paused',
+    'probing': 'Flow: not responding, retrying',
+}
+
+
+def show_server_state(view, state):
+    text = STATUS_TEXT.get(state)
+    if text:
+        view.set_status(STATUS_KEY, text)
+    else:
+        view.erase_status(STATUS_KEY)
+
+
+def show_health(view, state):
+    text = HEALTH_STATUS_TEXT.get(state)
+    if text:
+        view.set_status(HEALTH_STATUS_KEY, text)
+    else:
+        view.erase_status(HEALTH_STATUS_KEY)
+
+
+def update_root_views(root, show, state):
+    def update():
+        for window in sublime.windows():
+            for view in window.views():
+                if is_under(view.file_name(), root):
+                    show(view, state)
+    sublime.set_timeout(update)
+
+
+def on_server_state(root, state):
+    update_root_views(root, show_server_state, state)
+
+
+def on_circuit_state(root, state):
+    update_root_views(root, show_health, state)
+
+
+class FlowServerListener(sublime_plugin.EventListener):
+    @wait_for_load
+    def on_activated_async(self, view):
+        filename = view.file_name()
+        if not filename or not view.find(FLOW_PRAGMA, 0):
+            return
+
+        root = find_flow_config(filename)
+        if root == '/':
+            return
+
+        settings = view_settings(view)
+        bin = find_flow_bin(root, settings)
+        if settings.get('start_server_on_open'):
+            server_registry.warm_up(
+                bin, root, settings.get('use_persistent_connection')
+            )
+        if settings.get('index_project_symbols'):
+            index = symbol_indexes.get(root)
+            workers = settings.get('coverage_report_workers')
+            if workers is None:
+                workers = DEFAULT_WORKERS
+            if not index.refreshed and not index.refreshing:
+                index.refresh_in_background(bin, workers)
+        show_server_state(view, server_registry.state(root))
+        show_health(view, circuit_breaker.state(root))
+
+
+server_registry.add_listener(on_server_state)
+circuit_breaker.add_listener(on_circuit_state)
@@ -0,0 +1,87 @@
+import sublime
+import sublime_plugin
+
+from ..query import InvalidContext
+from ..scheduler import QueryCancelled, request_scheduler
+from ..settings import view_settings
+from ..state import view_state
+from ..type_hints import (
+    PREFETCH_CHANNEL,
+    prefetch_types,
+    query_type,
+    show_type_popup,
+    store_type,
+    token_span,
+    type_cache
+)
+from ..util import debounce, wait_for_load
+from ..view import when_done
+
+
+class FlowTypeHoverListener(sublime_plugin.EventListener):
+    def on_hover(self, view, point, hover_zone):
+        if hover_zone != sublime.HOVER_TEXT:
+            return
+        if not view_settings(view).get('show_type_on_hover'):
+            return
+
+        # Error popups take precedence over types
+        state = view_state(view)
+        if (
+            state.error_index and
+            state.check_revision == view.change_count() and
+            state.error_index.errors_at(point)
+        ):
+            return
+
+        span = token_span(view, point)
+        if not span:
+            return
+
+        cached = type_cache(view).get(span)
+        if cached is not None:
+            show_type_popup(view, cached, point)
+            return
+
+        revision = view.change_count()
+        sublime.set_timeout_async(
+            lambda: self.query_hover_type(view, revision, span, point)
+        )
+
+    @wait_for_load
+    def query_hover_type(self, view, revision, span, point):
+        when_done(
+            query_type(view, span, channel='type-hover'),
+            lambda future: self.on_hover_type_result(
+                view, revision, span, point, future
+            )
+        )
+
+    def on_hover_type_result(self, view, revision, span, point, future):
+        try:
+            result = future.result()
+        except (QueryCancelled, InvalidContext):
+            return
+        except Exception as e:
+            print('Flow type hover failed: ' + str(e))
+            return
+
+        store_type(view, revision, span, result)
+        if result and view.change_count() == revision:
+            show_type_popup(view, result.get('type'), point)
+
+    def on_selection_modified_async(self, view):
+        settings = view_settings(view)
+        if (
+            settings.get('show_type_on_hover') and
+            settings.get('type_prefetch_budget')
+        ):
+            self.run_prefetch(view)
+
+    def on_modified_async(self, view):
+        request_scheduler.cancel((view.id(), PREFETCH_CHANNEL))
+
+    @wait_for_load
+    @debounce()
+    def run_prefetch(self, view):
+        prefetch_types(view, view_settings(view).get('type_prefetch_budget'))
@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from collections import deque
+
+from .scheduler import QueryCancelled, QueryTimedOut
+
+
+STAGES = ('queue', 'spawn', 'server', 'decode', 'render', 'total')
+PERCENTILES = (50, 95, 99)
+WINDOW_SIZE = 200
+
+
+def percentile(ordered, p):
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return None
+    rank = max(int(round(p / 100.0 * len(ordered))), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def query_outcome(future):
+    exception = future.exception()
+    if exception is None:
+        return 'ok'
+    if isinstance(exception, QueryTimedOut):
+        return 'timeout'
+    if isinstance(exception, QueryCancelled):
+        return 'cancelled'
+    return 'error'
+
+
+# The last WINDOW_SIZE durations of one stage, so percentiles follow the
+# current state of the server rather than the whole session
+class LatencyHistogram:
+    def __init__(self, size=WINDOW_SIZE):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, duration):
+        self.samples.append(duration)
+        self.count += 1
+
+    def percentiles(self):
+        ordered = sorted(self.samples)
+        return [percentile(ordered, p) for p in PERCENTILES]
+
+
+# Timings of a single query. Stages are recorded as they happen; the
+# trace is written out once the result has been rendered (or dropped).
+class QueryTrace:
+    def __init__(self, metrics, command, root, path):
+        self.metrics = metrics
+        self.command = command
+        self.root = root
+        self.path = path
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.cached = False
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def record(self, stage, duration):
+        self.stages[stage] = self.stages.get(stage, 0) + duration
+        self.metrics.record(self.command, self.root, stage, duration)
+
+    def since_start(self):
+        return time.perf_counter() - self.started
+
+    def finish(self, outcome):
+        # Held until the trace is written, so a second caller can rely on
+        # it being written once finish returns
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.record('total', self.since_start())
+            self.metrics.notify(
+                self.command, self.root, outcome, self.stages
+            )
+            self.metrics.write_trace({
+                'time': self.timestamp,
+                'command': self.command,
+                'root': self.root,
+                'path': self.path,
+                'outcome': outcome,
+                'cached': self.cached,
+                'stages': dict(
+                    (stage, round(duration * 1000, 3))
+                    for stage, duration in self.stages.items()
+                )
+            })
+
+
+class Metrics:
+    def __init__(self):
+        self.histograms = {}
+        self.observers = []
+        self.trace_path = None
+        self.lock = threading.Lock()
+
+    def start(self, command, root, path):
+        return QueryTrace(self, command, root, path)
+
+    def record(self, command, root, stage, duration):
+        with self.lock:
+            for key in (('command', command), ('root', root)):
+                histogram = self.histograms.get(key + (stage,))
+                if histogram is None:
+                    histogram = self.histograms[key + (stage,)] = \
+                        LatencyHistogram()
+                histogram.add(duration)
+
+    # observer(command, root, outcome, stages) is called once per finished
+    # query, with stage durations in seconds
+    def add_observer(self, observer):
+        if observer not in self.observers:
+            self.observers.append(observer)
+
+    def notify(self, command, root, outcome, stages):
+        for observer in list(self.observers):
+            try:
+                observer(command, root, outcome, stages)
+            except Exception as e:
+                print('Flow metrics observer failed: ' + str(e))
+
+    def set_trace_file(self, path):
+        self.trace_path = path or None
+
+    def write_trace(self, entry):
+        path = self.trace_path
+        if not path:
+            return
+        line = json.dumps(entry) + '\n'
+        try:
+            with self.lock:
+                with open(path, 'a') as f:
+                    f.write(line)
+        except OSError as e:
+            print('Could not write the Flow trace file: ' + str(e))
+            self.trace_path = None
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def report(self):
+        with self.lock:
+            rows = sorted(
+                (
+                    (kind, str(name), STAGES.index(stage)), stage,
+                    histogram.count, histogram.percentiles()
+                )
+                for (kind, name, stage), histogram
+                in self.histograms.items()
+            )
+
+        if not rows:
+            return 'No Flow queries yet.\n'
+
+        header = '  {:<8} {:>7}' + ' {:>9}' * len(PERCENTILES)
+        row_format = '  {:<8} {:>7}' + ' {:>7.1f}ms' * len(PERCENTILES)
+        lines = []
+        section = None
+        for (kind, name, _), stage, count, values in rows:
+            if (kind, name) != section:
+                section = (kind, name)
+                lines.extend(['', '{}: {}'.format(kind, name), header.format(
+                    'stage', 'count', *['p{}'.format(p) for p in PERCENTILES]
+                )])
+            lines.append(row_format.format(
+                stage, count, *[value * 1000 for value in values]
+            ))
+        return 'Flow query latency over the last {} queries\n'.format(
+            WINDOW_SIZE
+        ) + '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
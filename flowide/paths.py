@@ -0,0 +1,91 @@
+import os
+import shutil
+import time
+
+
+# Roots, binaries and root fingerprints are re-resolved at most every
+# RESOLUTION_TTL seconds, or sooner when a .flowconfig, package.json or
+# project file is saved
+RESOLUTION_TTL = 10
+
+_flow_roots = {}
+_flow_bins = {}
+_resolved_bins = {}
+_fingerprints = {}
+
+
+def clear_resolution_cache():
+    _flow_roots.clear()
+    _flow_bins.clear()
+    _resolved_bins.clear()
+    _fingerprints.clear()
+
+
+def cached_resolution(cache, key, resolve):
+    cached = cache.get(key)
+    now = time.time()
+    if cached and now - cached[1] < RESOLUTION_TTL:
+        return cached[0]
+
+    value = resolve()
+    cache[key] = (value, now)
+    return value
+
+
+def search_flow_config(filename):
+    if not filename or filename == '/':
+        return '/'
+
+    potential_root = os.path.dirname(filename)
+    if os.path.isfile(os.path.join(potential_root, '.flowconfig')):
+        return potential_root
+
+    return search_flow_config(potential_root)
+
+
+def find_flow_config(filename):
+    if not filename or filename == '/':
+        return '/'
+
+    return cached_resolution(
+        _flow_roots,
+        os.path.dirname(filename),
+        lambda: search_flow_config(filename)
+    )
+
+
+def search_flow_bin(root_dir, use_npm_flow, flow_path):
+    if use_npm_flow:
+        npm_flow_bin = os.path.join(
+            root_dir, 'node_modules/.bin/flow'
+        )
+        if os.path.isfile(npm_flow_bin):
+            return npm_flow_bin
+
+    return flow_path
+
+
+def find_flow_bin(root_dir, flow_settings):
+    use_npm_flow = flow_settings.get('use_npm_flow')
+    flow_path = flow_settings.get('flow_path') or 'flow'
+
+    return cached_resolution(
+        _flow_bins,
+        (root_dir, use_npm_flow, flow_path),
+        lambda: search_flow_bin(root_dir, use_npm_flow, flow_path)
+    )
+
+
+def resolve_flow_bin(bin):
+    # The file a binary name like 'flow' runs, found on PATH
+    if not bin or os.path.isabs(bin):
+        return bin
+    return cached_resolution(
+        _resolved_bins, bin, lambda: shutil.which(bin) or bin
+    )
+
+
+def cached_fingerprint(root, bin, fingerprint):
+    return cached_resolution(
+        _fingerprints, (root, bin), lambda: fingerprint(root, bin)
+    )
@@ -0,0 +1,67 @@
+import re
+import sublime
+
+from .executor import PRIORITY_PREFETCH
+from .view import when_done
+
+
+IDENTIFIER = re.compile(r'[A-Za-z_$][\w$]*')
+IDENTIFIER_SELECTOR = (
+    'source.js - string - comment - keyword - storage - constant'
+)
+PREFETCH_LINES = 5
+
+
+def nearby_token_spans(view, limit, cached):
+    cursor = view.sel()[0].begin()
+    row, _ = view.rowcol(cursor)
+    region = sublime.Region(
+        view.text_point(max(row - PREFETCH_LINES, 0), 0),
+        view.line(view.text_point(row + PREFETCH_LINES, 0)).end()
+    )
+    text = view.substr(region)
+
+    spans = set()
+    for match in IDENTIFIER.finditer(text):
+        point = region.begin() + match.start()
+        if view.match_selector(point, IDENTIFIER_SELECTOR):
+            spans.add((point, region.begin() + match.end()))
+
+    spans = [span for span in spans if span not in cached]
+    spans.sort(key=lambda span: abs(span[0] - cursor))
+    return spans[:limit]
+
+
+# Looks up to `budget` identifiers around the cursor that aren't in
+# `cached` yet. query(view, span, **kwargs) returns a Future of a result
+# and store(view, revision, span, result) keeps it.
+def prefetch_nearby(view, budget, cached, query, store, channel):
+    if budget <= 0:
+        return
+    prefetch_next(
+        view, view.change_count(),
+        nearby_token_spans(view, budget, cached),
+        query, store, channel
+    )
+
+
+def prefetch_next(view, revision, spans, query, store, channel):
+    # One prefetch at a time, at the lowest priority; a buffer change
+    # cancels the query in flight and stops the rest
+    if not spans or view.change_count() != revision:
+        return
+
+    span = spans[0]
+
+    def on_result(future):
+        try:
+            result = future.result()
+        except Exception:
+            return
+        store(view, revision, span, result)
+        prefetch_next(view, revision, spans[1:], query, store, channel)
+
+    when_done(
+        query(view, span, channel=channel, priority=PRIORITY_PREFETCH),
+        on_result
+    )
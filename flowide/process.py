@@ -0,0 +1,35 @@
+import subprocess
+import time
+
+
+# `timings`, when given, receives how long starting the process took
+# ('spawn') and how long it then took to answer ('server')
+def run_flow(command, contents, token=None, timings=None):
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        stdin=subprocess.PIPE,
+        shell=False
+    )
+    spawned = time.perf_counter()
+    if token:
+        token.on_cancel(process.kill)
+
+    try:
+        # communicate() feeds stdin while draining stdout, so contents
+        # larger than the pipe buffer can't deadlock against flow's output
+        output, _ = process.communicate(
+            input=(contents or '').encode('utf-8')
+        )
+    finally:
+        if token:
+            token.remove_canceller(process.kill)
+        if timings is not None:
+            timings['spawn'] = spawned - started
+            timings['server'] = time.perf_counter() - spawned
+
+    if token:
+        token.raise_if_cancelled()
+    return process.returncode, output
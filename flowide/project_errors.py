@@ -0,0 +1,172 @@
+import os
+import threading
+import sublime
+
+from .connection import add_status_listener
+from .errors import error_description
+from .status import run_status
+from .view import erase_regions, locations_to_spans, render_regions
+
+
+PANEL_NAME = 'flow_errors'
+GUTTER_KEY = 'flow_project_error'
+RESULT_FILE_REGEX = r'^\s*(.+?):(\d+):(\d+): (.*)$'
+
+
+def is_under(path, root):
+    if not path:
+        return False
+    return (path + os.sep).startswith(root.rstrip(os.sep) + os.sep)
+
+
+def message_location(message):
+    return '{}:{}:{}'.format(
+        message.get('path') or '', message.get('line'), message.get('start')
+    )
+
+
+def format_errors(root, errors_by_path):
+    error_count = sum(len(errors) for errors in errors_by_path.values())
+    if not error_count:
+        return 'Flow: no errors\n'
+
+    lines = ['Flow: {} error{} in {} file{}'.format(
+        error_count, '' if error_count == 1 else 's',
+        len(errors_by_path), '' if len(errors_by_path) == 1 else 's'
+    ), '']
+
+    for path in sorted(errors_by_path, key=lambda path: path or ''):
+        for error in errors_by_path[path]:
+            messages = [
+                dict(message, path=os.path.relpath(message['path'], root))
+                if message.get('path') else message
+                for message in error.get('message', [])
+            ]
+            if not messages:
+                continue
+            lines.append('{}: {}'.format(
+                message_location(messages[0]), error_description(error)
+            ))
+            for message in messages[1:]:
+                if message.get('path') and message.get('line'):
+                    lines.append('    {}: {}'.format(
+                        message_location(message), message.get('descr', '')
+                    ))
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+class ProjectDiagnostics:
+    def __init__(self, root, bin):
+        self.root = root
+        self.bin = bin
+        self.errors_by_path = {}
+        self.window_ids = set()
+        self.running = False
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        # A refresh requested while one is running reruns it afterwards
+        with self.lock:
+            if self.running:
+                self.dirty = True
+                return
+            self.running = True
+
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.errors_by_path, _ = run_status(self.bin, self.root)
+                sublime.set_timeout_async(self.render)
+            except Exception as e:
+                print('flow status failed for {}: {}'.format(self.root, e))
+
+            with self.lock:
+                if not self.dirty:
+                    self.running = False
+                    return
+                self.dirty = False
+
+    def render(self):
+        text = format_errors(self.root, self.errors_by_path)
+        for window in sublime.windows():
+            if window.id() in self.window_ids:
+                self.render_panel(window, text)
+            for view in window.views():
+                if is_under(view.file_name(), self.root):
+                    self.render_gutter(view)
+
+    def render_panel(self, window, text):
+        panel = window.find_output_panel(PANEL_NAME) or \
+            window.create_output_panel(PANEL_NAME)
+        panel.settings().set('result_file_regex', RESULT_FILE_REGEX)
+        panel.settings().set('result_base_dir', self.root)
+        panel.settings().set('word_wrap', False)
+        panel.set_read_only(False)
+        panel.run_command('select_all')
+        panel.run_command('right_delete')
+        panel.run_command('append', {
+            'characters': text,
+            'force': True,
+            'scroll_to_end': False
+        })
+        panel.set_read_only(True)
+
+    def render_gutter(self, view):
+        filename = view.file_name()
+        locations = []
+        for error in self.errors_by_path.get(filename, []):
+            for message in error.get('message', []):
+                if message.get('path') != filename or not message.get('line'):
+                    continue
+                row = int(message['line']) - 1
+                endrow = int(message.get('endline') or message['line']) - 1
+                locations.append((
+                    row, int(message['start']) - 1,
+                    endrow, int(message['end'])
+                ))
+
+        if not locations:
+            erase_regions(view, GUTTER_KEY)
+            return
+
+        render_regions(
+            view, GUTTER_KEY, locations_to_spans(view, locations),
+            'invalid', 'dot',
+            sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE
+        )
+
+
+_project_diagnostics = {}
+
+
+def enable_project_diagnostics(window, root, bin):
+    diagnostics = _project_diagnostics.get(root)
+    if not diagnostics or diagnostics.bin != bin:
+        diagnostics = _project_diagnostics[root] = \
+            ProjectDiagnostics(root, bin)
+    diagnostics.window_ids.add(window.id())
+    return diagnostics
+
+
+def project_diagnostics_for(filename):
+    for root, diagnostics in _project_diagnostics.items():
+        if is_under(filename, root):
+            return diagnostics
+    return None
+
+
+def on_server_state(root, previous, state):
+    # Refresh when Flow finishes a recheck, never on a timer
+    diagnostics = _project_diagnostics.get(root)
+    if diagnostics and state == 'ready' and previous != 'ready':
+        diagnostics.refresh()
+
+
+add_status_listener(on_server_state)
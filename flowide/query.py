@@ -0,0 +1,738 @@
+import os
+import json
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+
+from .breaker import SERVER_FAILURE_CODES, CircuitOpen, circuit_breaker
+from .buffer import insert_magic_token
+from .cache import DEFAULT_CACHE_SIZE, hash_contents, result_cache
+from .connection import ConnectionFailed, query_connection
+from .disk_cache import DEFAULT_SIZE_MB, disk_cache
+from .executor import (
+    COMMAND_PRIORITIES,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_MAX_PENDING,
+    PRIORITY_CHECK,
+    PRIORITY_PREFETCH,
+    TooManyQueries,
+    chain_future,
+    completed_future,
+    query_executor
+)
+from .metrics import metrics, query_outcome
+from .paths import find_flow_bin, find_flow_config
+from .process import run_flow
+from .scheduler import QueryCancelled, QueryTimedOut, request_scheduler
+from .servers import ServerNotReady, server_registry
+
+
+# The autocomplete listener checks its results against the completion
+# anchor itself, so typing during the query must not discard them
+REVISION_INDEPENDENT_COMMANDS = ('autocomplete',)
+
+# Queries that only depend on a buffer's contents; views of the same
+# buffer (clones, split views) share them
+SHARED_COMMANDS = ('check-contents', 'coverage')
+
+# (owner, channel, revision) -> Future of a shared query still running
+_shared_queries = {}
+_shared_queries_lock = threading.Lock()
+
+# Results that would be stale by the time a starting server is up; other
+# queries wait for it instead
+SKIPPED_WHILE_STARTING = ('autocomplete',)
+
+# Seconds Flow gets to answer each command, overridden per command by the
+# query_timeouts setting; 0 waits forever
+DEFAULT_QUERY_TIMEOUTS = {
+    'autocomplete': 10,
+    'type-at-pos': 15,
+    'get-def': 15,
+    'check-contents': 30,
+    'coverage': 30,
+}
+
+
+def merge_dicts(*dictionaries):
+    result = {}
+    for dictionary in dictionaries:
+        result.update(dictionary)
+    return result
+
+
+# What a query runs on, independent of any editor: a file's path and
+# contents and a cursor offset into them. Queries with the same owner
+# and channel supersede each other; the owner defaults to the path.
+# Buffers with the same buffer_id are views of the same contents.
+class Buffer:
+    def __init__(self, path, contents, point=0, revision=None, scope=None,
+                 row_col=None, owner=None, buffer_id=None):
+        self.path = path
+        self.contents = contents
+        self.point = point
+        self.revision = revision
+        self.scope = scope
+        self.owner = owner if owner is not None else path
+        self.buffer_id = buffer_id
+        self._row_col = row_col
+
+    @property
+    def row_col(self):
+        # Counted directly, a whole line offset table isn't worth building
+        # for a single point
+        if self._row_col is None:
+            contents = self.contents
+            line_start = contents.rfind('\n', 0, self.point) + 1
+            self._row_col = (
+                contents.count('\n', 0, self.point), self.point - line_start
+            )
+        return self._row_col
+
+
+def resolve_dependencies(buffer, settings, add_magic_token=False):
+    flow_project_root = find_flow_config(buffer.path)
+    binary = find_flow_bin(flow_project_root, settings)
+    row, col = buffer.row_col
+
+    current_contents = buffer.contents
+    if add_magic_token:
+        current_contents = insert_magic_token(current_contents, buffer.point)
+
+    return {
+        'bin': binary,
+        'root': flow_project_root,
+        'path': buffer.path,
+        'cursor_pos': buffer.point,
+        'cursor_scope': buffer.scope,
+        'contents': current_contents,
+        'row': row,
+        'col': col,
+        'revision': buffer.revision,
+        'owner': buffer.owner
+    }
+
+
+def forget_shared_query(share_key, future):
+    with _shared_queries_lock:
+        if _shared_queries.get(share_key) is future:
+            del _shared_queries[share_key]
+
+
+class CLIInvocation:
+    def __init__(self, **kwargs):
+        self.bin = kwargs.get('bin')
+        self.name = kwargs.get('name')
+
+        # Args
+        self._root = kwargs.get('root')
+        self._path = kwargs.get('path')
+
+        # Default args
+        self._from_editor = kwargs.get('from_editor', 'nuclide')
+        self._json = kwargs.get('json', True)
+        self._retry_if_init = kwargs.get('retry_if_init', True)
+
+        # Targets
+        self.row = kwargs.get('row')
+        self.col = kwargs.get('col')
+        self.filename = kwargs.get('filename')
+        self.contents = kwargs.get('contents')
+
+        # Only used by persistent connections, never serialized
+        self.cursor = kwargs.get('cursor')
+
+        # Buffer revision the contents were read at
+        self.revision = kwargs.get('revision')
+        self.token = None
+
+        # A query supersedes the previous one on the same channel of its
+        # owner; the priority defaults to the command's
+        self.owner = kwargs.get('owner')
+        self.buffer_id = kwargs.get('buffer_id')
+        self.channel = kwargs.get('channel') or self.name
+        self.priority = kwargs.get('priority')
+        self.trace = None
+        self.timed_out = False
+        self.exit_code = None
+        self._content_hash = None
+
+    # Shared by the result and persistent cache keys
+    @property
+    def content_hash(self):
+        if self._content_hash is None:
+            self._content_hash = hash_contents(self.contents)
+        return self._content_hash
+
+    @property
+    def root(self):
+        return ['--root', self._root] \
+            if self._root else None
+
+    @root.setter
+    def root(self, value):
+        self._root = value
+
+    @property
+    def path(self):
+        return ['--path', self._path] \
+            if self._path else None
+
+    @path.setter
+    def path(self, value):
+        self._path = value
+
+    @property
+    def from_editor(self):
+        return ['--from', self._from_editor] \
+            if self._from_editor else None
+
+    @from_editor.setter
+    def from_editor(self, value):
+        self._from_editor = value
+
+    @property
+    def json(self):
+        return ['--json'] if self._json else None
+
+    @json.setter
+    def json(self, value):
+        self._json = value
+
+    @property
+    def retry_if_init(self):
+        return [
+            '--retry-if-init',
+            'true' if self._retry_if_init else 'false'
+        ]
+
+    @retry_if_init.setter
+    def retry_if_init(self, value):
+        self._retry_if_init = value
+
+    @property
+    def args(self):
+        properties = [
+            self.from_editor,
+            self.root,
+            self.path,
+            self.json,
+            self.retry_if_init
+        ]
+        return [
+            arg
+            for args in properties
+            if args is not None
+            for arg in args
+            if arg is not None
+        ]
+
+    @property
+    def targets(self):
+        targets = [
+            str(self.row + 1) if self.row is not None else None,
+            str(self.col + 1) if self.col is not None else None,
+            self.filename
+        ]
+
+        return [
+            target
+            for target in targets
+            if target is not None
+        ]
+
+    def serialize(self):
+        return [self.bin, self.name] + self.args + self.targets
+
+
+class InvalidContext(RuntimeError):
+    pass
+
+
+def extract_deps(add_magic_token=False):
+    def wrapper(func):
+        def wrapped(self, buffer, **kwargs):
+            kwargs['deps'] = resolve_dependencies(
+                buffer, self.settings, add_magic_token=add_magic_token
+            )
+            kwargs['revision'] = buffer.revision
+            kwargs['owner'] = buffer.owner
+            kwargs['buffer_id'] = buffer.buffer_id
+            return func(self, **kwargs)
+        return wrapped
+    return wrapper
+
+
+# Queries run on the query executor, so query methods always return a
+# Future; errors raised before submission are delivered through it too.
+def returns_future(func):
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        except Exception as e:
+            return completed_future(exception=e)
+    return wrapper
+
+
+def validate(func):
+    def wrapper(self, *args, **kwargs):
+        deps = kwargs['deps']
+        if deps['root'] == '/':
+            raise InvalidContext('No .flowconfig found.')
+
+        if (
+            '// @flow' not in deps['contents'] and
+            '/* @flow */' not in deps['contents']
+        ):
+            raise InvalidContext('No @flow pragma present in contents.')
+
+        # Buffers from outside the editor carry no scope to check
+        if (
+            deps['cursor_scope'] is not None and
+            'source.js' not in deps['cursor_scope']
+        ):
+            raise InvalidContext('Contents are not Javascript.')
+
+        kwargs['deps'] = deps
+        return func(self, *args, **kwargs)
+    return wrapper
+
+
+# Runs Flow queries on Buffers. `settings` is a plain mapping of the
+# FlowIDE settings; `current_revision`, when given, returns the
+# revision the buffer is at now, so results for older ones are dropped.
+class FlowClient:
+    # Clients that render results finish each query's trace themselves,
+    # once rendering is done; the others finish it with the query
+    renders_results = False
+
+    def __init__(self, settings, current_revision=None):
+        self.settings = settings
+        self.current_revision = current_revision
+
+    @returns_future
+    @extract_deps()
+    @validate
+    def get_def(self, **kwargs):
+        deps = kwargs['deps']
+        default_args = {
+            'bin': deps['bin'],
+            'name': 'get-def',
+            'contents': deps['contents'],
+            'root': deps['root'],
+            'path': deps['path'],
+            'row': deps['row'],
+            'col': deps['col']
+        }
+        return self.call_cli(
+            CLIInvocation(**merge_dicts(default_args, kwargs)),
+        )
+
+    @returns_future
+    @extract_deps()
+    @validate
+    def type_at_pos(self, **kwargs):
+        deps = kwargs['deps']
+        default_args = {
+            'bin': deps['bin'],
+            'name': 'type-at-pos',
+            'contents': deps['contents'],
+            'root': deps['root'],
+            'path': deps['path'],
+            'row': deps['row'],
+            'col': deps['col']
+        }
+        return self.call_cli(
+            CLIInvocation(**merge_dicts(default_args, kwargs)),
+        )
+
+    @returns_future
+    @extract_deps(add_magic_token=True)
+    @validate
+    def autocomplete(self, **kwargs):
+        deps = kwargs['deps']
+        default_args = {
+            'bin': deps['bin'],
+            'name': 'autocomplete',
+            'contents': deps['contents'],
+            'root': deps['root'],
+            'retry_if_init': False,
+            'filename': deps['path'],
+            'cursor': (deps['row'], deps['col'])
+        }
+        return self.call_cli(
+            CLIInvocation(**merge_dicts(default_args, kwargs)),
+        )
+
+    @returns_future
+    @extract_deps()
+    @validate
+    def check_contents(self, **kwargs):
+        deps = kwargs['deps']
+        default_args = {
+            'bin': deps['bin'],
+            'name': 'check-contents',
+            'contents': deps['contents'],
+            'root': deps['root'],
+            'retry_if_init': False,
+            'filename': deps['path']
+        }
+        return self.call_cli(
+            CLIInvocation(**merge_dicts(default_args, kwargs)),
+        )
+
+    @returns_future
+    @extract_deps()
+    @validate
+    def coverage(self, **kwargs):
+        deps = kwargs['deps']
+        default_args = {
+            'bin': deps['bin'],
+            'name': 'coverage',
+            'contents': deps['contents'],
+            'root': deps['root'],
+            'retry_if_init': False,
+            'filename': deps['path']
+        }
+        return self.call_cli(
+            CLIInvocation(**merge_dicts(default_args, kwargs)),
+        )
+
+    # A Future of the result stored on disk for the buffer's exact
+    # contents, or of None: possibly stale, as other files may have
+    # changed since. Looked up on its own thread, as reading the cache
+    # and asking Flow for its version can take a while.
+    @returns_future
+    def last_known_result(self, buffer, name):
+        if not self.use_disk_cache():
+            return completed_future()
+        future = Future()
+
+        def look_up():
+            try:
+                deps = resolve_dependencies(buffer, self.settings)
+                result = None
+                if deps['root'] != '/':
+                    result = disk_cache.get(disk_cache.key(
+                        name, deps['bin'], deps['root'], deps['path'],
+                        hash_contents(deps['contents'])
+                    ))
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        thread = threading.Thread(target=look_up)
+        thread.daemon = True
+        thread.start()
+        return future
+
+    def use_disk_cache(self):
+        if not self.settings.get('persistent_cache'):
+            return False
+        size_mb = self.settings.get('persistent_cache_size_mb')
+        if size_mb is None:
+            size_mb = DEFAULT_SIZE_MB
+        disk_cache.resize(size_mb * 1024 * 1024)
+        return True
+
+    def call_cli(self, invocation):
+        settings = self.settings
+
+        # Every view of a buffer takes part in the same query of a revision
+        share_key = None
+        if (
+            invocation.name in SHARED_COMMANDS and
+            invocation.buffer_id is not None
+        ):
+            invocation.owner = ('buffer', invocation.buffer_id)
+            share_key = (
+                invocation.owner, invocation.channel, invocation.revision
+            )
+            with _shared_queries_lock:
+                future = _shared_queries.get(share_key)
+            if future and not future.done():
+                return future
+
+        # Supersedes (and kills) the owner's previous query of the same kind
+        token = request_scheduler.begin(
+            (invocation.owner, invocation.channel), invocation.revision
+        )
+        invocation.token = token
+
+        metrics.set_trace_file(settings.get('trace_file'))
+        trace = invocation.trace = metrics.start(
+            invocation.name, invocation._root,
+            invocation._path or invocation.filename
+        )
+        future = self.submit_query(invocation, settings)
+        future.trace = trace
+        if share_key and not future.done():
+            with _shared_queries_lock:
+                _shared_queries[share_key] = future
+            future.add_done_callback(
+                lambda future: forget_shared_query(share_key, future)
+            )
+        if not self.renders_results:
+            future.add_done_callback(
+                lambda future: trace.finish(query_outcome(future))
+            )
+        return future
+
+    def submit_query(self, invocation, settings):
+        token = invocation.token
+
+        cache_size = settings.get('result_cache_size')
+        if cache_size is None:
+            cache_size = DEFAULT_CACHE_SIZE
+        result_cache.resize(cache_size)
+
+        cache_key = result_cache.key(invocation) if cache_size else None
+        if cache_key:
+            result_cache.validate(invocation._root, invocation.bin)
+            hit, result = result_cache.get(cache_key)
+            if hit:
+                invocation.trace.cached = True
+                try:
+                    self.raise_if_stale(token)
+                except QueryCancelled as e:
+                    return completed_future(exception=e)
+                request_scheduler.finish(token)
+                return completed_future(result)
+
+        concurrency = settings.get('max_concurrent_queries')
+        query_executor.set_concurrency(
+            concurrency if concurrency is not None else DEFAULT_CONCURRENCY
+        )
+        priority = invocation.priority
+        if priority is None:
+            priority = COMMAND_PRIORITIES.get(invocation.name)
+
+        def submit():
+            return query_executor.submit(
+                priority,
+                invocation._root,
+                lambda: self.run_query(invocation, cache_key),
+                token
+            )
+
+        # Rather than fire queries a starting server can't answer, drop
+        # the ones that will be stale by then and hold the rest back
+        state = server_registry.state(invocation._root)
+        if state in ('initializing', 'rechecking') and (
+            priority >= PRIORITY_PREFETCH or
+            state == 'initializing' and
+            invocation.name in SKIPPED_WHILE_STARTING
+        ):
+            request_scheduler.finish(token)
+            return completed_future(exception=ServerNotReady(
+                'The Flow server is {}.'.format(state)
+            ))
+        if state == 'initializing':
+            return self.defer_until_ready(invocation, priority, submit)
+
+        refused = self.refuse(invocation, priority)
+        if refused:
+            request_scheduler.finish(token)
+            return completed_future(exception=refused)
+        return submit()
+
+    def refuse(self, invocation, priority):
+        # Background queries are the first to go when Flow falls behind
+        if priority < PRIORITY_CHECK:
+            return None
+        max_pending = self.settings.get('max_pending_queries')
+        if max_pending is None:
+            max_pending = DEFAULT_MAX_PENDING
+        if max_pending and (
+            query_executor.pending(invocation._root) >= max_pending
+        ):
+            return TooManyQueries('Too many Flow queries are already waiting.')
+        if not circuit_breaker.allow(invocation._root):
+            return CircuitOpen('The Flow server is not responding.')
+        return None
+
+    def defer_until_ready(self, invocation, priority, submit):
+        future = Future()
+        token = invocation.token
+        # Readiness and cancellation race; the first to claim the future
+        # settles it
+        claimed = []
+        claim_lock = threading.Lock()
+
+        def claim():
+            with claim_lock:
+                if claimed:
+                    return False
+                claimed.append(True)
+                return True
+
+        # A superseded query is let go straight away rather than holding
+        # its buffer contents until the server is up
+        def on_cancelled():
+            if not claim():
+                return
+            server_registry.stop_waiting(invocation._root, on_ready)
+            future.set_exception(
+                QueryCancelled('Superseded while Flow was starting.')
+            )
+
+        def on_ready():
+            token.remove_canceller(on_cancelled)
+            if not claim():
+                return
+            if token.cancelled:
+                future.set_exception(
+                    QueryCancelled('Superseded while Flow was starting.')
+                )
+                return
+            # Everything held back is released at once, so a server that
+            # just came up gets the same protection as a slow one
+            refused = self.refuse(invocation, priority)
+            if refused:
+                request_scheduler.finish(invocation.token)
+                future.set_exception(refused)
+            else:
+                chain_future(submit(), future)
+
+        server_registry.when_ready(invocation._root, on_ready)
+        if not claimed:
+            token.on_cancel(on_cancelled)
+        return future
+
+    def run_query(self, invocation, cache_key):
+        token = invocation.token
+        invocation.trace.record('queue', invocation.trace.since_start())
+        token.raise_if_cancelled()
+
+        result = self.call_flow_with_timeout(invocation)
+        if cache_key and result is not None:
+            result_cache.put(cache_key, result)
+        if result is not None and self.use_disk_cache():
+            disk_cache.put(disk_cache.key(
+                invocation.name, invocation.bin, invocation._root,
+                invocation.filename, invocation.content_hash
+            ), result)
+
+        self.raise_if_stale(token)
+        request_scheduler.finish(token)
+        return result
+
+    def raise_if_stale(self, token):
+        token.raise_if_cancelled()
+        if not request_scheduler.is_current(token):
+            raise QueryCancelled('A newer query was started.')
+        if (
+            self.current_revision and
+            token.key[1] not in REVISION_INDEPENDENT_COMMANDS and
+            token.revision is not None and
+            token.revision != self.current_revision()
+        ):
+            request_scheduler.finish(token)
+            raise QueryCancelled('The buffer changed during the query.')
+
+    def query_timeout(self, name):
+        timeouts = merge_dicts(
+            DEFAULT_QUERY_TIMEOUTS, self.settings.get('query_timeouts') or {}
+        )
+        return timeouts.get(name)
+
+    def call_flow_with_timeout(self, invocation):
+        token = invocation.token
+        timeout = self.query_timeout(invocation.name)
+
+        # Timing out cancels the query, which kills its process or
+        # cancels its request on the connection
+        def time_out():
+            invocation.timed_out = True
+            token.cancel()
+
+        timer = None
+        if timeout:
+            timer = threading.Timer(timeout, time_out)
+            timer.daemon = True
+            timer.start()
+        try:
+            result = self.call_flow(invocation)
+        except QueryCancelled:
+            if not invocation.timed_out:
+                raise
+            circuit_breaker.record_failure(invocation._root)
+            request_scheduler.finish(token)
+            raise QueryTimedOut('Flow took over {}s to answer {}.'.format(
+                timeout, invocation.name
+            ))
+        except Exception:
+            # A missing binary or a broken .flowconfig isn't the server
+            # failing to answer, and surfaces as it is
+            if invocation.exit_code in SERVER_FAILURE_CODES:
+                circuit_breaker.record_failure(invocation._root)
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+
+        circuit_breaker.record_success(invocation._root)
+        return result
+
+    def call_flow(self, invocation):
+        if self.settings.get('use_persistent_connection'):
+            started = time.perf_counter()
+            try:
+                result = query_connection(invocation)
+            except ConnectionFailed as e:
+                if self.settings.get('log_queries'):
+                    print(
+                        'Flow connection unavailable, using the CLI: ' +
+                        str(e)
+                    )
+            else:
+                invocation.trace.record(
+                    'server', time.perf_counter() - started
+                )
+                return result
+
+        return self.call_subprocess(invocation)
+
+    def call_subprocess(self, invocation):
+        command = invocation.serialize()
+
+        if self.settings.get('log_queries'):
+            print(command)
+
+        # Make sure that we have the default place
+        # flow is installed in our $PATH
+        if '/usr/local/bin' not in os.environ['PATH']:
+            os.environ['PATH'] += ':/usr/local/bin'
+
+        try:
+            timings = {}
+            returncode, output = run_flow(
+                command, invocation.contents, invocation.token, timings
+            )
+            for stage, duration in timings.items():
+                invocation.trace.record(stage, duration)
+            invocation.exit_code = returncode
+            if returncode:
+                raise subprocess.CalledProcessError(
+                    returncode, command, output=output
+                )
+            return self.decode(invocation, output)
+        except QueryCancelled:
+            raise
+        except subprocess.CalledProcessError as e:
+            try:
+                return self.decode(invocation, e.output)
+            except:
+                print(e.output)
+                raise
+        except Exception as e:
+            print(e)
+            raise
+
+    def decode(self, invocation, output):
+        started = time.perf_counter()
+        result = json.loads(output.decode('utf-8'))
+        invocation.trace.record('decode', time.perf_counter() - started)
+        return result
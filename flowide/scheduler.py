@@ -0,0 +1,101 @@
+import threading
+
+
+class QueryCancelled(RuntimeError):
+    pass
+
+
+class QueryTimedOut(QueryCancelled):
+    pass
+
+
+class CancellationToken:
+    def __init__(self, key, generation, revision):
+        self.key = key
+        self.generation = generation
+        self.revision = revision
+        self.cancelled = False
+        self.cancellers = []
+        self.lock = threading.Lock()
+
+    def on_cancel(self, canceller):
+        with self.lock:
+            if not self.cancelled:
+                self.cancellers.append(canceller)
+                return
+        canceller()
+
+    def remove_canceller(self, canceller):
+        with self.lock:
+            if canceller in self.cancellers:
+                self.cancellers.remove(canceller)
+
+    def cancel(self):
+        with self.lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            cancellers = self.cancellers
+            self.cancellers = []
+        for canceller in cancellers:
+            try:
+                canceller()
+            except Exception as e:
+                print('Could not cancel Flow query: ' + str(e))
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise QueryCancelled(
+                'Superseded by a newer {} query.'.format(self.key[1])
+            )
+
+
+# Tracks the latest query per (view, command). Starting a query cancels
+# the one it supersedes, which kills its subprocess or cancels its
+# request on a persistent connection.
+class RequestScheduler:
+    def __init__(self):
+        self.generation = 0
+        self.latest = {}
+        self.lock = threading.Lock()
+
+    def begin(self, key, revision):
+        with self.lock:
+            self.generation += 1
+            token = CancellationToken(key, self.generation, revision)
+            previous = self.latest.get(key)
+            self.latest[key] = token
+
+        if previous:
+            previous.cancel()
+        return token
+
+    def is_current(self, token):
+        with self.lock:
+            return self.latest.get(token.key) is token
+
+    def finish(self, token):
+        with self.lock:
+            if self.latest.get(token.key) is token:
+                del self.latest[token.key]
+
+    def cancel(self, key):
+        with self.lock:
+            token = self.latest.pop(key, None)
+        if token:
+            token.cancel()
+
+    def cancel_view(self, view_id):
+        with self.lock:
+            tokens = [
+                token for key, token in self.latest.items()
+                if key[0] == view_id
+            ]
+            for token in tokens:
+                del self.latest[token.key]
+
+        for token in tokens:
+            token.cancel()
+
+
+request_scheduler = RequestScheduler()
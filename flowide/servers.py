@@ -0,0 +1,146 @@
+import threading
+import time
+
+from .connection import ConnectionFailed, add_status_listener, get_connection
+from .process import run_flow
+from .scheduler import QueryCancelled
+
+
+# Queued queries run anyway if a server takes longer than this to start
+WARMUP_TIMEOUT = 120
+RETRY_DELAY = 30
+
+# `flow start` exits with this when a server is already running
+ALREADY_RUNNING = 11
+
+
+class ServerNotReady(QueryCancelled):
+    pass
+
+
+# What is known about the Flow server of each root: 'initializing',
+# 'ready' or 'rechecking', or nothing for roots FlowIDE hasn't started
+# or heard from. Queries for an initializing root wait in `waiting`.
+# Only a persistent connection reports 'rechecking'; with the CLI alone
+# a root stays 'ready' once its server is up.
+class ServerRegistry:
+    def __init__(self):
+        self.states = {}
+        self.waiting = {}
+        self.failed_at = {}
+        self.started_at = {}
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def state(self, root):
+        return self.states.get(root)
+
+    # listener(root, state) is called from background threads
+    def add_listener(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def set_state(self, root, state):
+        with self.lock:
+            previous = self.states.get(root)
+            if state is None:
+                self.states.pop(root, None)
+            else:
+                self.states[root] = state
+            released = []
+            if state != 'initializing':
+                released = self.waiting.pop(root, [])
+
+        for callback in released:
+            callback()
+        if state != previous:
+            self.notify(root, state)
+
+    def notify(self, root, state):
+        for listener in list(self.listeners):
+            try:
+                listener(root, state)
+            except Exception as e:
+                print('Flow server listener failed: ' + str(e))
+
+    def when_ready(self, root, callback):
+        with self.lock:
+            if self.states.get(root) == 'initializing':
+                self.waiting.setdefault(root, []).append(callback)
+                return
+        callback()
+
+    def stop_waiting(self, root, callback):
+        with self.lock:
+            waiting = self.waiting.get(root)
+            if waiting and callback in waiting:
+                waiting.remove(callback)
+                if not waiting:
+                    del self.waiting[root]
+
+    def warm_up(self, bin, root, use_connection):
+        with self.lock:
+            if root in self.states:
+                return
+            failed_at = self.failed_at.get(root)
+            if failed_at and time.time() - failed_at < RETRY_DELAY:
+                return
+            self.started_at[root] = time.time()
+            self.states[root] = 'initializing'
+        self.notify(root, 'initializing')
+
+        thread = threading.Thread(
+            target=self.start_server, args=(bin, root, use_connection)
+        )
+        thread.daemon = True
+        thread.start()
+
+        timer = threading.Timer(WARMUP_TIMEOUT, lambda: self.give_up(root))
+        timer.daemon = True
+        timer.start()
+
+    def start_server(self, bin, root, use_connection):
+        state = None
+        try:
+            if use_connection:
+                state = self.connect(bin, root)
+            if state is None:
+                returncode, _ = run_flow([bin, 'start', '--wait', root], '')
+                if returncode in (0, ALREADY_RUNNING):
+                    state = 'ready'
+        except OSError as e:
+            print('Could not start the Flow server for {}: {}'.format(
+                root, e
+            ))
+
+        if state is None:
+            self.failed_at[root] = time.time()
+        # The connection may have reported a newer state in the meantime
+        if self.states.get(root) == 'initializing':
+            self.set_state(root, state)
+
+    def connect(self, bin, root):
+        try:
+            connection = get_connection(bin, root)
+        except ConnectionFailed:
+            return None
+        # flow lsp answers initialize before the server is up, and says
+        # so through window/showStatus; without one assume it is ready
+        if connection.status_received:
+            return connection.server_state
+        return 'ready'
+
+    def give_up(self, root):
+        started_at = self.started_at.get(root, 0)
+        if (
+            self.states.get(root) == 'initializing' and
+            time.time() - started_at >= WARMUP_TIMEOUT
+        ):
+            self.set_state(root, None)
+
+    def on_server_state(self, root, previous, state):
+        self.set_state(root, state)
+
+
+server_registry = ServerRegistry()
+add_status_listener(server_registry.on_server_state)
@@ -1,4 +1,53 @@
 import sublime
+from types import MappingProxyType
+
+
+SETTINGS_KEYS = (
+    'use_npm_flow',
+    'flow_path',
+    'omit_function_parameters',
+    'show_sublime_autocomplete_suggestions',
+    'debounce_ms',
+    'adaptive_debounce',
+    'debounce_min_ms',
+    'debounce_max_ms',
+    'show_coverage',
+    'use_persistent_connection',
+    'start_server_on_open',
+    'result_cache_size',
+    'persistent_cache',
+    'persistent_cache_size_mb',
+    'max_concurrent_queries',
+    'max_pending_queries',
+    'query_timeouts',
+    'show_type_on_hover',
+    'type_prefetch_budget',
+    'definition_prefetch_budget',
+    'coverage_report_workers',
+    'index_project_symbols',
+    'log_queries',
+    'trace_file',
+)
+
+
+_settings = None
+_snapshots = {}
+
+
+def load_settings():
+    global _settings
+    if _settings is None:
+        _settings = sublime.load_settings('FlowIDE.sublime-settings')
+        _settings.add_on_change('FlowIDE', clear_settings_snapshots)
+    return _settings
+
+
+def unload_settings():
+    global _settings
+    if _settings is not None:
+        _settings.clear_on_change('FlowIDE')
+        _settings = None
+    _snapshots.clear()
 
 
 def get_setting(settings, project_data, key):
@@ -13,33 +62,33 @@ def get_setting(settings, project_data, key):
 
 
 def find_flow_settings(project_data):
-    settings = sublime.load_settings('FlowIDE.sublime-settings')
+    settings = load_settings()
 
     flow_settings = {}
-    flow_settings['use_npm_flow'] = get_setting(
-        settings,
-        project_data,
-        'use_npm_flow'
-    )
-    flow_settings['flow_path'] = get_setting(
-        settings,
-        project_data,
-        'flow_path'
-    )
-    flow_settings['omit_function_parameters'] = get_setting(
-        settings,
-        project_data,
-        'omit_function_parameters'
-    )
-    flow_settings['show_sublime_autocomplete_suggestions'] = get_setting(
-        settings,
-        project_data,
-        'show_sublime_autocomplete_suggestions'
-    )
-    flow_settings['debounce_ms'] = get_setting(
-        settings,
-        project_data,
-        'debounce_ms'
-    )
+    for key in SETTINGS_KEYS:
+        flow_settings[key] = get_setting(settings, project_data, key)
 
     return flow_settings
+
+
+# Hot paths read an immutable per-window snapshot. It is only rebuilt
+# when FlowIDE.sublime-settings changes or the window's project does.
+def window_settings(window):
+    window_id = window.id() if window else None
+    snapshot = _snapshots.get(window_id)
+    if snapshot is None:
+        project_data = window.project_data() if window else None
+        snapshot = MappingProxyType(find_flow_settings(project_data))
+        _snapshots[window_id] = snapshot
+    return snapshot
+
+
+def view_settings(view):
+    return window_settings(view.window())
+
+
+def clear_settings_snapshots(window=None):
+    if window is None:
+        _snapshots.clear()
+    else:
+        _snapshots.pop(window.id(), None)
@@ -0,0 +1,44 @@
+class ViewState:
+    def __init__(self):
+        # Buffer revision (view.change_count()) each result was computed for
+        self.check_revision = None
+        self.coverage_revision = None
+
+        # Commands whose result was restored from the persistent cache
+        self.restored = set()
+
+        self.error_count_text = None
+        self.error_index = None
+
+        # Token span (begin, end) -> type, for the buffer at type_revision
+        self.type_revision = None
+        self.types = {}
+
+        # Token span -> (get-def result, version of the file it points
+        # into), for the buffer at definition_revision
+        self.definition_revision = None
+        self.definitions = {}
+
+        # Region key -> RegionLayer, what is currently drawn in the view
+        self.region_layers = {}
+
+
+_view_states = {}
+
+
+def view_state(view):
+    state = _view_states.get(view.id())
+    if state is None:
+        state = _view_states[view.id()] = ViewState()
+    return state
+
+
+def discard_view_state(view):
+    _view_states.pop(view.id(), None)
+
+
+def invalidate_view_state(view):
+    state = _view_states.get(view.id())
+    if state:
+        state.check_revision = None
+        state.coverage_revision = None
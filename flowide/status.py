@@ -0,0 +1,140 @@
+import codecs
+import json
+import subprocess
+
+
+READ_CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+# Parses `flow status --json` output as it arrives. Errors are handed out
+# one by one as soon as each is complete, so neither the whole output nor
+# its decoded form is ever held in memory at once.
+class StatusStreamParser:
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.state = 'start'
+        self.key = None
+        self.fields = {}
+
+    def feed(self, data):
+        self.buffer = self.buffer[self.position:] + \
+            self.text_decoder.decode(data)
+        self.position = 0
+        return list(self.parse())
+
+    def skip(self, characters):
+        while (
+            self.position < len(self.buffer) and
+            self.buffer[self.position] in characters
+        ):
+            self.position += 1
+        return self.position < len(self.buffer)
+
+    def decode_value(self):
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.position)
+        except ValueError:
+            # Incomplete value, wait for more data
+            return False, None
+        # A number at the end of the data may have more digits to come
+        if end == len(self.buffer) and type(value) in (int, float):
+            return False, None
+        self.position = end
+        return True, value
+
+    def parse(self):
+        while self.skip(WHITESPACE):
+            char = self.buffer[self.position]
+
+            if self.state == 'start':
+                if char != '{':
+                    raise ValueError('flow status did not return an object')
+                self.position += 1
+                self.state = 'key'
+
+            elif self.state == 'key':
+                if char == ',':
+                    self.position += 1
+                    continue
+                if char == '}':
+                    self.position += 1
+                    self.state = 'done'
+                    continue
+                complete, self.key = self.decode_value()
+                if not complete:
+                    return
+                self.state = 'colon'
+
+            elif self.state == 'colon':
+                self.position += 1
+                self.state = 'value'
+
+            elif self.state == 'value':
+                if self.key == 'errors' and char == '[':
+                    self.position += 1
+                    self.state = 'errors'
+                    continue
+                complete, value = self.decode_value()
+                if not complete:
+                    return
+                self.fields[self.key] = value
+                self.state = 'key'
+
+            elif self.state == 'errors':
+                if char == ',':
+                    self.position += 1
+                    continue
+                if char == ']':
+                    self.position += 1
+                    self.state = 'key'
+                    continue
+                complete, error = self.decode_value()
+                if not complete:
+                    return
+                yield error
+
+            else:
+                self.position = len(self.buffer)
+
+
+def error_path(error):
+    for message in error.get('message', []):
+        if message.get('path'):
+            return message['path']
+    return None
+
+
+def run_status(bin, root, on_error=None):
+    command = [
+        bin, 'status', '--from', 'nuclide', '--json', '--root', root
+    ]
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        stdin=subprocess.DEVNULL,
+        shell=False
+    )
+
+    parser = StatusStreamParser()
+    errors_by_path = {}
+    try:
+        while True:
+            chunk = process.stdout.read1(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            for error in parser.feed(chunk):
+                errors_by_path.setdefault(error_path(error), []).append(error)
+                if on_error:
+                    on_error(error)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+    if parser.state != 'done':
+        raise ValueError('flow status returned incomplete JSON')
+    return errors_by_path, parser.fields
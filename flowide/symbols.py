@@ -0,0 +1,348 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import file_mtime
+from .coverage_report import (
+    DEFAULT_WORKERS,
+    JS_EXTENSIONS,
+    find_flow_files,
+    read_flow_file
+)
+from .process import run_flow
+
+
+INDEX_VERSION = 2
+
+# Saved files are re-indexed together once saving pauses for this long
+UPDATE_DELAY = 1.0
+
+DECLARATION_KINDS = {
+    'FunctionDeclaration': 'function',
+    'ClassDeclaration': 'class',
+    'VariableDeclaration': 'variable',
+    'TypeAlias': 'type',
+    'OpaqueType': 'type',
+    'InterfaceDeclaration': 'interface',
+    'EnumDeclaration': 'enum',
+    'DeclareClass': 'class',
+    'DeclareFunction': 'function',
+    'DeclareVariable': 'variable',
+}
+EXPORT_STATEMENTS = ('ExportNamedDeclaration', 'ExportDefaultDeclaration')
+
+# Fields of a symbol, as stored in an index file's per-file lists.
+# EXPORTED is 'default' for a default export.
+NAME, KIND, LINE, COLUMN, EXPORTED = range(5)
+
+# Fields of an import binding: the local name, the name it has in the
+# module ('default', or '*' for a namespace import) and the module
+LOCAL, IMPORTED, SOURCE = range(3)
+
+
+def declarations(program):
+    # Top-level and exported declarations of a Flow AST, with 1-based
+    # lines and columns
+    symbols = []
+    for statement in program.get('body', []):
+        exported = statement.get('type') in EXPORT_STATEMENTS
+        if statement.get('type') == 'ExportDefaultDeclaration':
+            exported = 'default'
+        node = statement.get('declaration') if exported else statement
+        if not isinstance(node, dict):
+            continue
+        kind = DECLARATION_KINDS.get(node.get('type'))
+        if not kind:
+            continue
+
+        if node['type'] == 'VariableDeclaration':
+            identifiers = [
+                declarator.get('id')
+                for declarator in node.get('declarations', [])
+            ]
+        else:
+            identifiers = [node.get('id')]
+        for identifier in identifiers:
+            if identifier and identifier.get('type') == 'Identifier':
+                start = identifier['loc']['start']
+                symbols.append([
+                    identifier['name'], kind,
+                    start['line'], start['column'] + 1, exported
+                ])
+    return symbols
+
+
+def imports(program):
+    bindings = []
+    for statement in program.get('body', []):
+        if statement.get('type') != 'ImportDeclaration':
+            continue
+        source = (statement.get('source') or {}).get('value')
+        for specifier in statement.get('specifiers', []):
+            kind = specifier.get('type')
+            if kind == 'ImportDefaultSpecifier':
+                imported = 'default'
+            elif kind == 'ImportNamespaceSpecifier':
+                imported = '*'
+            else:
+                imported = (specifier.get('imported') or {}).get('name')
+            local = (specifier.get('local') or {}).get('name')
+            if local and imported and source:
+                bindings.append([local, imported, source])
+    return bindings
+
+
+def file_declarations(bin, path):
+    returncode, output = run_flow([bin, 'ast', path], '')
+    program = json.loads(output.decode('utf-8'))
+    return declarations(program), imports(program)
+
+
+# Top-level declarations of every @flow file under a Flow root, built from
+# `flow ast` (which needs no server) and kept up to date by file mtime.
+# Saved to `directory`, when given, so sessions start with the last index.
+class SymbolIndex:
+    def __init__(self, root, directory=None):
+        self.root = root
+        self.directory = directory
+        # path -> (mtime, symbols, import bindings)
+        self.files = {}
+        self.loaded = False
+        self.refreshed = False
+        self.refreshing = False
+        # Saved files waiting to be re-indexed, and the timer that will
+        self.queued = set()
+        self.update_timer = None
+        self.lock = threading.Lock()
+
+    @property
+    def path(self):
+        name = hashlib.sha1(self.root.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'symbols-{}.json'.format(name))
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+            self.loaded = True
+            if not self.directory:
+                return
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return
+            if data.get('version') != INDEX_VERSION:
+                return
+            self.files = {
+                path: tuple(entry)
+                for path, entry in data.get('files', {}).items()
+            }
+
+    def save(self):
+        if not self.directory:
+            return
+        with self.lock:
+            data = {
+                'version': INDEX_VERSION,
+                'root': self.root,
+                'files': {
+                    path: list(entry) for path, entry in self.files.items()
+                }
+            }
+        temporary = self.path + '.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print('Could not save the Flow symbol index: ' + str(e))
+
+    def index_file(self, bin, path, mtime):
+        symbols, bindings = [], []
+        if read_flow_file(path) is not None:
+            try:
+                symbols, bindings = file_declarations(bin, path)
+            except (ValueError, KeyError, TypeError, OSError) as e:
+                print('Could not index {}: {}'.format(path, e))
+        with self.lock:
+            self.files[path] = (mtime, symbols, bindings)
+
+    def refresh(self, bin, workers=DEFAULT_WORKERS, on_progress=None):
+        self.load()
+        with self.lock:
+            if self.refreshing:
+                return False
+            self.refreshing = True
+
+        try:
+            current = {}
+            for path in find_flow_files(self.root):
+                current[path] = file_mtime(path)
+            with self.lock:
+                for path in set(self.files) - set(current):
+                    del self.files[path]
+                stale = [
+                    path for path, mtime in current.items()
+                    if path not in self.files or
+                    self.files[path][0] != mtime
+                ]
+
+            done = [0]
+
+            def index(path):
+                self.index_file(bin, path, current[path])
+                done[0] += 1
+                if on_progress:
+                    on_progress(done[0], len(stale))
+
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+                list(pool.map(index, sorted(stale)))
+            if stale or not self.refreshed:
+                self.save()
+            self.refreshed = True
+        finally:
+            with self.lock:
+                self.refreshing = False
+        return True
+
+    def refresh_in_background(self, bin, workers=DEFAULT_WORKERS):
+        thread = threading.Thread(target=self.refresh, args=(bin, workers))
+        thread.daemon = True
+        thread.start()
+
+    def queue_update(self, bin, path):
+        # Re-indexing runs `flow ast` and rewrites the index file, so a
+        # burst of saves is handled in one go on a thread of its own
+        with self.lock:
+            self.queued.add(path)
+            if self.update_timer:
+                self.update_timer.cancel()
+            self.update_timer = threading.Timer(
+                UPDATE_DELAY, self.update_queued, args=(bin,)
+            )
+            self.update_timer.daemon = True
+            self.update_timer.start()
+
+    def update_queued(self, bin):
+        self.load()
+        with self.lock:
+            paths = self.queued
+            self.queued = set()
+            self.update_timer = None
+        for path in sorted(paths):
+            self.index_file(bin, path, file_mtime(path))
+        if paths:
+            self.save()
+
+    def symbols(self):
+        self.load()
+        with self.lock:
+            files = list(self.files.items())
+        return [
+            (path, symbol)
+            for path, entry in sorted(files)
+            for symbol in entry[1]
+        ]
+
+    def file_entry(self, path):
+        self.load()
+        with self.lock:
+            entry = self.files.get(path)
+        return entry if entry else (None, [], [])
+
+    def resolve_module(self, from_path, source):
+        # Relative imports only, resolved against the indexed files
+        if not source.startswith('.'):
+            return None
+        base = os.path.normpath(
+            os.path.join(os.path.dirname(from_path), source)
+        )
+        candidates = [base] + [
+            base + extension for extension in JS_EXTENSIONS
+        ] + [
+            os.path.join(base, 'index' + extension)
+            for extension in JS_EXTENSIONS
+        ]
+        with self.lock:
+            for candidate in candidates:
+                if candidate in self.files:
+                    return candidate
+        return None
+
+    def definition_candidates(self, name, from_path):
+        # Where `name`, used in `from_path`, may be declared, and whether
+        # that is certain: it is for top-level names of the file itself
+        # and for imports resolved to an indexed module. Anything else
+        # may be a local that merely shares a name with a declaration.
+        _, symbols, bindings = self.file_entry(from_path)
+        own = [symbol for symbol in symbols if symbol[NAME] == name]
+        if own:
+            return [(from_path, own[0])], True
+
+        for binding in bindings:
+            if binding[LOCAL] != name:
+                continue
+            module = self.resolve_module(from_path, binding[SOURCE])
+            if not module:
+                break
+            _, exports, _ = self.file_entry(module)
+            if binding[IMPORTED] == 'default':
+                matches = [
+                    symbol for symbol in exports
+                    if symbol[EXPORTED] == 'default'
+                ]
+            else:
+                matches = [
+                    symbol for symbol in exports
+                    if symbol[EXPORTED] and symbol[NAME] == binding[IMPORTED]
+                ]
+            if matches:
+                return [(module, matches[0])], True
+            # The module itself, for namespace imports and exports the
+            # index doesn't know about
+            return [(module, [name, 'module', 1, 1, False])], True
+
+        return self.lookup(name, from_path), False
+
+    def lookup(self, name, from_path=None):
+        # The file's own declaration first, then exported ones
+        matches = [
+            (path, symbol) for path, symbol in self.symbols()
+            if symbol[NAME] == name
+        ]
+        matches.sort(key=lambda match: (
+            match[0] != from_path, not match[1][EXPORTED]
+        ))
+        return matches
+
+
+class SymbolIndexes:
+    def __init__(self):
+        self.directory = None
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def set_directory(self, directory):
+        with self.lock:
+            self.directory = directory
+            self.indexes = {}
+
+    def get(self, root):
+        with self.lock:
+            index = self.indexes.get(root)
+            if index is None:
+                index = self.indexes[root] = SymbolIndex(
+                    root, self.directory
+                )
+            return index
+
+    def existing(self, root):
+        with self.lock:
+            return self.indexes.get(root)
+
+
+symbol_indexes = SymbolIndexes()
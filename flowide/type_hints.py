@@ -0,0 +1,55 @@
+import html
+import sublime
+
+from .cli import CLI
+from .prefetch import IDENTIFIER, IDENTIFIER_SELECTOR, prefetch_nearby
+from .state import view_state
+
+
+PREFETCH_CHANNEL = 'type-prefetch'
+
+
+def token_span(view, point):
+    if not view.match_selector(point, IDENTIFIER_SELECTOR):
+        return None
+    word = view.word(point)
+    if word.empty() or not IDENTIFIER.match(view.substr(word)):
+        return None
+    return (word.begin(), word.end())
+
+
+def type_cache(view):
+    # Types are cached per token span and only for the current revision
+    state = view_state(view)
+    revision = view.change_count()
+    if state.type_revision != revision:
+        state.type_revision = revision
+        state.types = {}
+    return state.types
+
+
+def store_type(view, revision, span, result):
+    if not result or view.change_count() != revision:
+        return
+    type_cache(view)[span] = result.get('type')
+
+
+def show_type_popup(view, type_text, point=-1):
+    if not type_text:
+        return
+    view.show_popup(
+        '<code>{}</code>'.format(html.escape(type_text)),
+        sublime.HIDE_ON_MOUSE_MOVE_AWAY,
+        point
+    )
+
+
+def query_type(view, span, **kwargs):
+    return CLI(view).type_at_pos(point=span[0], **kwargs)
+
+
+def prefetch_types(view, budget):
+    prefetch_nearby(
+        view, budget, type_cache(view), query_type, store_type,
+        PREFETCH_CHANNEL
+    )
@@ -1,7 +1,8 @@
-import os
 import plugin_state
-from threading import Timer
-from .settings import find_flow_settings
+from threading import Lock, Timer
+from .adaptive_delay import adaptive_delay
+from .paths import find_flow_config
+from .settings import view_settings
 
 
 def wait_for_load(func):
@@ -14,51 +15,43 @@ def wait_for_load(func):
 
 
 # Adapted from https://gist.github.com/walkermatt/2871026
-def debounce(func):
-    def debounced(self, *args, **kwargs):
-        flow_settings = find_flow_settings(
-            self.view.window().project_data()
-        )
-        debounce_ms = flow_settings.get('debounce_ms')
-
-        def call_func():
-            func(self, *args, **kwargs)
-        try:
-            debounced.timer.cancel()
-        except(AttributeError):
-            pass
-
-        debounced.timer = Timer(debounce_ms / 1000, call_func)
-        debounced.timer.start()
-    return debounced
-
-
-def merge_dicts(*dictionaries):
-    result = {}
-    for dictionary in dictionaries:
-        result.update(dictionary)
-    return result
-
-
-def find_flow_config(filename):
-    if not filename or filename is '/':
-        return '/'
-
-    potential_root = os.path.dirname(filename)
-    if os.path.isfile(os.path.join(potential_root, '.flowconfig')):
-        return potential_root
-
-    return find_flow_config(potential_root)
-
-
-def find_flow_bin(root_dir, project_data):
-    flow_settings = find_flow_settings(project_data)
-    if flow_settings.get('use_npm_flow'):
-        npm_flow_bin = os.path.join(
-            root_dir, 'node_modules/.bin/flow'
-        )
-        if os.path.isfile(npm_flow_bin):
-            return npm_flow_bin
-
-    flow_path = flow_settings.get('flow_path', 'flow')
-    return flow_path
+# Timers are kept per view so editing one file never cancels
+# another file's pending query. Given the Flow command it schedules,
+# the delay adapts to Flow's latency and typing speed when
+# adaptive_debounce is on.
+def debounce(command=None):
+    def decorator(func):
+        timers = {}
+        lock = Lock()
+
+        def debounced(self, view, *args, **kwargs):
+            flow_settings = view_settings(view)
+            debounce_ms = flow_settings.get('debounce_ms')
+            view_id = view.id()
+
+            if command and flow_settings.get('adaptive_debounce'):
+                key = (view_id, command)
+                adaptive_delay.keystroke(key)
+                debounce_ms = 1000 * adaptive_delay.delay(
+                    key,
+                    find_flow_config(view.file_name()),
+                    command,
+                    flow_settings.get('debounce_min_ms') / 1000,
+                    flow_settings.get('debounce_max_ms') / 1000
+                )
+
+            def call_func():
+                with lock:
+                    if timers.get(view_id) is timer:
+                        del timers[view_id]
+                func(self, view, *args, **kwargs)
+
+            with lock:
+                previous = timers.get(view_id)
+                if previous:
+                    previous.cancel()
+                timer = Timer(debounce_ms / 1000, call_func)
+                timers[view_id] = timer
+            timer.start()
+        return debounced
+    return decorator
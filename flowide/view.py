@@ -1,31 +1,195 @@
 import sublime
+import time
+
+from .buffer import get_buffer_snapshot, locations_to_points
+from .metrics import query_outcome
+from .state import view_state
+
+
+# Result sets larger than this only draw the viewport (plus a margin of
+# lines) at first, and fill in the rest as it scrolls into view
+LAZY_REGION_THRESHOLD = 2000
+VIEWPORT_MARGIN = 100
+VIEWPORT_POLL_MS = 250
 
 
 def display_unknown_error(view, e):
-    view.erase_regions('flow_error')
-    view.erase_regions('flow_uncovered')
+    erase_regions(view, 'flow_error')
+    erase_regions(view, 'flow_uncovered')
     view.set_status(
         'flow_error',
         'Unknown Flow error: ' + str(e)
     )
 
 
-def build_snippet(name, params):
-    snippet = name + '({})'
-    paramText = ''
+# Runs `callback(future)` on Sublime's async thread once a query is done,
+# timing it as the query's render stage
+def when_done(future, callback):
+    trace = getattr(future, 'trace', None)
+
+    def run_callback():
+        started = time.perf_counter()
+        try:
+            callback(future)
+        finally:
+            if trace:
+                outcome = query_outcome(future)
+                if outcome == 'ok':
+                    trace.record('render', time.perf_counter() - started)
+                trace.finish(outcome)
+
+    future.add_done_callback(
+        lambda future: sublime.set_timeout_async(run_callback)
+    )
+
+
+def buffer_views(view):
+    # The view and every other view of its buffer, in any window
+    buffer_id = view.buffer_id()
+    views = [
+        other
+        for window in sublime.windows()
+        for other in window.views()
+        if other.buffer_id() == buffer_id
+    ]
+    return views if view in views else [view] + views
+
+
+def view_snapshot(view):
+    return get_buffer_snapshot(
+        view.buffer_id(),
+        view.change_count(),
+        lambda: view.substr(sublime.Region(0, view.size()))
+    )
+
+
+def locations_to_spans(view, locations):
+    return locations_to_points(view_snapshot(view).text_point, locations)
+
+
+class RegionLayer:
+    def __init__(self, scope, icon, flags):
+        self.style = (scope, icon, flags)
+        # Spans are offsets into the buffer at `revision`
+        self.revision = None
+        self.drawn = []
+        self.pending = []
+        self.generation = 0
+        # Whether fill_viewport is scheduled, and the visible region it
+        # last filled
+        self.polling = False
+        self.viewport = None
+
+
+def viewport_span(view):
+    visible = view.visible_region()
+    first_row = view.rowcol(visible.begin())[0] - VIEWPORT_MARGIN
+    last_row = view.rowcol(visible.end())[0] + VIEWPORT_MARGIN
+    return (
+        view.text_point(max(first_row, 0), 0),
+        view.text_point(last_row + 1, 0)
+    )
+
+
+def is_visible(view):
+    window = view.window()
+    return bool(window) and any(
+        window.active_view_in_group(group) == view
+        for group in range(window.num_groups())
+    )
 
-    for param in params:
-        if not paramText:
-            paramText += param['name']
+
+def split_visible(spans, viewport):
+    start, end = viewport
+    visible = []
+    hidden = []
+    for span in spans:
+        if span[1] >= start and span[0] <= end:
+            visible.append(span)
         else:
-            paramText += ', ' + param['name']
+            hidden.append(span)
+    return visible, hidden
+
+
+def draw_layer(view, key, layer, spans):
+    # Skip add_regions entirely when nothing changed since the last draw.
+    # After an edit Sublime has moved the drawn regions, so the same
+    # offsets for a new revision still need drawing.
+    revision = view.change_count()
+    if (revision, spans) == (layer.revision, layer.drawn):
+        return
+    layer.revision = revision
+    layer.drawn = spans
+    scope, icon, flags = layer.style
+    view.add_regions(
+        key, [sublime.Region(a, b) for a, b in spans], scope, icon, flags
+    )
+
+
+def render_regions(view, key, spans, scope, icon='', flags=0):
+    layers = view_state(view).region_layers
+    layer = layers.get(key)
+    if not layer or layer.style != (scope, icon, flags):
+        layer = layers[key] = RegionLayer(scope, icon, flags)
+    layer.generation += 1
+    # A poll scheduled for the previous spans stops at its next tick
+    layer.polling = False
+
+    if len(spans) > LAZY_REGION_THRESHOLD:
+        layer.viewport = view.visible_region()
+        drawn, layer.pending = split_visible(spans, viewport_span(view))
+    else:
+        drawn, layer.pending = spans, []
+
+    draw_layer(view, key, layer, drawn)
+    if layer.pending:
+        schedule_viewport_fill(view, key, layer)
+
+
+def schedule_viewport_fill(view, key, layer):
+    if layer.polling:
+        return
+    layer.polling = True
+    generation = layer.generation
+    sublime.set_timeout_async(
+        lambda: fill_viewport(view, key, generation), VIEWPORT_POLL_MS
+    )
+
+
+def resume_viewport_fill(view):
+    # Polling stops while a view is hidden, and restarts once it is
+    # activated again
+    for key, layer in list(view_state(view).region_layers.items()):
+        if layer.pending:
+            schedule_viewport_fill(view, key, layer)
+
+
+def fill_viewport(view, key, generation):
+    if not view.is_valid():
+        return
+    layer = view_state(view).region_layers.get(key)
+    if not layer or layer.generation != generation:
+        return
+    layer.polling = False
+    # The pending offsets are for a buffer that has since been edited
+    if not layer.pending or view.change_count() != layer.revision:
+        layer.pending = []
+        return
+    if not is_visible(view):
+        return
 
-    return snippet.format(paramText)
+    viewport = view.visible_region()
+    if viewport != layer.viewport:
+        layer.viewport = viewport
+        visible, layer.pending = split_visible(
+            layer.pending, viewport_span(view)
+        )
+        if visible:
+            draw_layer(view, key, layer, sorted(layer.drawn + visible))
+    if layer.pending:
+        schedule_viewport_fill(view, key, layer)
 
 
-def rowcol_to_region(view, row, col, endcol, endrow=None):
-    if not endrow:
-        endrow = row
-    start = view.text_point(row, col)
-    end = view.text_point(endrow, endcol)
-    return sublime.Region(start, end)
+def erase_regions(view, key):
+    view.erase_regions(key)
+    view_state(view).region_layers.pop(key, None)
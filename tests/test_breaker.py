@@ -0,0 +1,86 @@
+import unittest
+
+from flowide.breaker import CircuitBreaker
+
+
+ROOT = '/project'
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=3, probe_interval=30)
+        self.events = []
+        self.breaker.add_listener(
+            lambda root, state: self.events.append((root, state))
+        )
+
+    def open(self, now=0):
+        for _ in range(3):
+            self.breaker.record_failure(ROOT, now)
+
+    def test_opens_after_threshold_failures_in_a_row(self):
+        self.breaker.record_failure(ROOT, 0)
+        self.breaker.record_failure(ROOT, 0)
+        self.assertEqual(self.breaker.state(ROOT), 'closed')
+        self.breaker.record_failure(ROOT, 0)
+        self.assertEqual(self.breaker.state(ROOT), 'open')
+        self.assertEqual(self.events, [(ROOT, 'open')])
+        self.assertFalse(self.breaker.allow(ROOT, 10))
+        self.assertTrue(self.breaker.allow('/other', 10))
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure(ROOT, 0)
+        self.breaker.record_failure(ROOT, 0)
+        self.breaker.record_success(ROOT)
+        self.breaker.record_failure(ROOT, 0)
+        self.assertEqual(self.breaker.state(ROOT), 'closed')
+        self.assertEqual(self.events, [])
+
+    def test_one_probe_after_the_interval(self):
+        self.open()
+        self.assertTrue(self.breaker.allow(ROOT, 30))
+        self.assertEqual(self.breaker.state(ROOT), 'probing')
+        self.assertFalse(self.breaker.allow(ROOT, 31))
+        self.assertEqual(self.events, [(ROOT, 'open'), (ROOT, 'probing')])
+
+    def test_successful_probe_closes(self):
+        self.open()
+        self.breaker.allow(ROOT, 30)
+        self.breaker.record_success(ROOT)
+        self.assertEqual(self.breaker.state(ROOT), 'closed')
+        self.assertTrue(self.breaker.allow(ROOT, 31))
+        self.assertEqual(self.events[-1], (ROOT, 'closed'))
+
+    def test_failed_probe_reopens(self):
+        self.open()
+        self.breaker.allow(ROOT, 30)
+        self.breaker.record_failure(ROOT, 35)
+        self.assertEqual(self.breaker.state(ROOT), 'open')
+        self.assertFalse(self.breaker.allow(ROOT, 60))
+        self.assertTrue(self.breaker.allow(ROOT, 65))
+
+    def test_probe_that_never_reports_back_is_replaced(self):
+        self.open()
+        self.breaker.allow(ROOT, 30)
+        self.assertFalse(self.breaker.allow(ROOT, 59))
+        self.assertTrue(self.breaker.allow(ROOT, 60))
+        self.assertEqual(self.breaker.state(ROOT), 'probing')
+
+    def test_reset_closes_every_root(self):
+        self.open()
+        self.breaker.reset()
+        self.assertEqual(self.breaker.state(ROOT), 'closed')
+        self.assertTrue(self.breaker.allow(ROOT, 1))
+        self.assertEqual(self.events[-1], (ROOT, 'closed'))
+
+    def test_failing_listener_does_not_break_the_breaker(self):
+        def fail(root, state):
+            raise RuntimeError('listener')
+        self.breaker.listeners.insert(0, fail)
+        self.open()
+        self.assertEqual(self.breaker.state(ROOT), 'open')
+        self.assertEqual(self.events, [(ROOT, 'open')])
+
+
+if __name__ == '__main__':
+    unittest.main()
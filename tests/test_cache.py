@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flowide import paths
+from flowide.cache import ResultCache, hash_contents
+
+
+class Invocation:
+    def __init__(self, name='type-at-pos', root='/project', path='/a.js',
+                 row=1, col=2, contents='// @flow'):
+        self.name = name
+        self._root = root
+        self._path = path
+        self.filename = None
+        self.row = row
+        self.col = col
+        self.contents = contents
+        self.content_hash = hash_contents(contents)
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        paths.clear_resolution_cache()
+        self.root = tempfile.mkdtemp()
+        self.flowconfig = os.path.join(self.root, '.flowconfig')
+        open(self.flowconfig, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        paths.clear_resolution_cache()
+
+    def test_key_depends_on_contents_and_position(self):
+        cache = ResultCache()
+        key = cache.key(Invocation())
+        self.assertEqual(key, cache.key(Invocation()))
+        self.assertNotEqual(key, cache.key(Invocation(contents='changed')))
+        self.assertNotEqual(key, cache.key(Invocation(col=3)))
+
+    def test_uncached_commands_have_no_key(self):
+        self.assertIsNone(ResultCache().key(Invocation(name='autocomplete')))
+
+    def test_get_counts_hits_and_misses(self):
+        cache = ResultCache()
+        key = cache.key(Invocation())
+        self.assertEqual(cache.get(key), (False, None))
+        cache.put(key, {'type': 'number'})
+        self.assertEqual(cache.get(key), (True, {'type': 'number'}))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertEqual(cache.get('a'), (True, 1))
+        self.assertEqual(cache.get('c'), (True, 3))
+
+    def test_resize_evicts(self):
+        cache = ResultCache()
+        for key in 'abc':
+            cache.put(key, key)
+        cache.resize(1)
+        self.assertEqual(cache.stats()['size'], 1)
+        self.assertEqual(cache.get('c'), (True, 'c'))
+
+    def test_invalidate_root_only_drops_that_root(self):
+        cache = ResultCache()
+        ours = cache.key(Invocation(root='/project'))
+        theirs = cache.key(Invocation(root='/other'))
+        cache.put(ours, 1)
+        cache.put(theirs, 2)
+        cache.invalidate_root('/project')
+        self.assertEqual(cache.get(ours), (False, None))
+        self.assertEqual(cache.get(theirs), (True, 2))
+
+    def test_validate_drops_results_when_flowconfig_changes(self):
+        cache = ResultCache()
+        key = cache.key(Invocation(root=self.root))
+        cache.validate(self.root, 'flow')
+        cache.put(key, 1)
+
+        cache.validate(self.root, 'flow')
+        self.assertEqual(cache.get(key), (True, 1))
+
+        os.utime(self.flowconfig, (0, 0))
+        # Saving a .flowconfig clears the cached fingerprints
+        paths.clear_resolution_cache()
+        cache.validate(self.root, 'flow')
+        self.assertEqual(cache.get(key), (False, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flowide import paths
+from flowide.disk_cache import CACHE_FILE, DiskCache
+
+
+MISSING_BIN = '/nonexistent/flow'
+
+
+def key(path, contents='// @flow'):
+    return ('1.0', 'config', path, contents, 'check-contents')
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        paths.clear_resolution_cache()
+        self.directory = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.directory, CACHE_FILE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        paths.clear_resolution_cache()
+
+    def test_results_survive_a_new_instance(self):
+        cache = DiskCache(self.directory)
+        cache.put(key('/a.js'), {'passed': True})
+        cache.flush()
+        self.assertEqual(
+            DiskCache(self.directory).get(key('/a.js')), {'passed': True}
+        )
+
+    def test_results_are_written_on_flush(self):
+        cache = DiskCache(self.directory)
+        cache.put(key('/a.js'), {'passed': False})
+        cache.put(key('/a.js'), {'passed': True})
+        self.assertEqual(cache.get(key('/a.js')), {'passed': True})
+        self.assertFalse(os.path.exists(self.cache_file))
+
+        cache.flush()
+        with open(self.cache_file) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        cache.flush()
+        self.assertEqual(cache.size, os.path.getsize(self.cache_file))
+
+    def test_size_counts_encoded_bytes(self):
+        cache = DiskCache(self.directory)
+        cache.put(key('/a.js'), {'message': 'caf\u00e9 \u2603'})
+        cache.flush()
+        self.assertEqual(cache.size, os.path.getsize(self.cache_file))
+        reloaded = DiskCache(self.directory)
+        reloaded.get(key('/a.js'))
+        self.assertEqual(reloaded.size, os.path.getsize(self.cache_file))
+
+    def test_later_results_win(self):
+        cache = DiskCache(self.directory)
+        cache.put(key('/a.js'), {'passed': True})
+        cache.flush()
+        cache.put(key('/a.js'), {'passed': False})
+        cache.flush()
+        self.assertEqual(
+            DiskCache(self.directory).get(key('/a.js')), {'passed': False}
+        )
+
+    def test_skips_lines_cut_short(self):
+        cache = DiskCache(self.directory)
+        cache.put(key('/a.js'), {'passed': True})
+        cache.flush()
+        with open(self.cache_file, 'a') as f:
+            f.write('{"key": ["1.0", "con')
+
+        reloaded = DiskCache(self.directory)
+        self.assertEqual(reloaded.get(key('/a.js')), {'passed': True})
+        # Appended after the broken line, not onto it
+        reloaded.put(key('/b.js'), {'passed': True})
+        reloaded.flush()
+        again = DiskCache(self.directory)
+        self.assertEqual(again.get(key('/a.js')), {'passed': True})
+        self.assertEqual(again.get(key('/b.js')), {'passed': True})
+
+    def test_compacts_to_the_most_recent_results(self):
+        cache = DiskCache(self.directory, max_bytes=1000)
+        for i in range(50):
+            cache.put(key('/{}.js'.format(i)), {'passed': True})
+            cache.flush()
+
+        self.assertLessEqual(os.path.getsize(self.cache_file), 1000)
+        reloaded = DiskCache(self.directory, max_bytes=1000)
+        self.assertEqual(reloaded.get(key('/49.js')), {'passed': True})
+        self.assertIsNone(reloaded.get(key('/0.js')))
+
+    def test_clear_removes_the_file(self):
+        cache = DiskCache(self.directory)
+        cache.put(key('/a.js'), {'passed': True})
+        cache.flush()
+        cache.clear()
+        cache.flush()
+        self.assertFalse(os.path.exists(self.cache_file))
+        self.assertIsNone(cache.get(key('/a.js')))
+
+    def test_disabled_without_a_directory(self):
+        cache = DiskCache()
+        cache.put(key('/a.js'), {'passed': True})
+        cache.flush()
+        self.assertIsNone(cache.get(key('/a.js')))
+
+    def test_key(self):
+        root = self.directory
+        flowconfig = os.path.join(root, '.flowconfig')
+        with open(flowconfig, 'w') as f:
+            f.write('[options]\n')
+
+        cache = DiskCache(self.directory)
+        self.assertIsNone(
+            cache.key('autocomplete', MISSING_BIN, root, '/a.js', 'x')
+        )
+        self.assertIsNone(
+            cache.key('check-contents', MISSING_BIN, None, '/a.js', 'x')
+        )
+
+        first = cache.key('coverage', MISSING_BIN, root, '/a.js', 'x')
+        self.assertEqual(
+            first, cache.key('coverage', MISSING_BIN, root, '/a.js', 'x')
+        )
+        self.assertNotEqual(
+            first, cache.key('coverage', MISSING_BIN, root, '/a.js', 'y')
+        )
+
+        with open(flowconfig, 'w') as f:
+            f.write('[options]\nall=true\n')
+        os.utime(flowconfig, (0, 0))
+        paths.clear_resolution_cache()
+        self.assertNotEqual(
+            first, cache.key('coverage', MISSING_BIN, root, '/a.js', 'x')
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
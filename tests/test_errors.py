@@ -0,0 +1,118 @@
+import unittest
+
+from flowide.errors import ErrorIndex, error_locations, uncovered_locations
+
+
+def text_point(row, col):
+    # Every line is 100 characters long
+    return row * 100 + col
+
+
+def error(descr, line, start, end):
+    return {'message': [
+        {'descr': descr, 'line': line, 'start': start, 'end': end}
+    ]}
+
+
+class ErrorLocationsTest(unittest.TestCase):
+    def test_operation_and_messages_are_zero_based(self):
+        located = dict(error('bad', 2, 3, 5), operation={
+            'line': 1, 'start': 1, 'end': 4
+        })
+        self.assertEqual(
+            error_locations(located), [(0, 0, 0, 4), (1, 2, 1, 5)]
+        )
+
+    def test_uncovered_locations(self):
+        result = {'expressions': {'uncovered_locs': [{
+            'start': {'line': 1, 'column': 2},
+            'end': {'line': 3, 'column': 4}
+        }]}}
+        self.assertEqual(uncovered_locations(result), [(0, 1, 2, 4)])
+
+
+class ErrorIndexTest(unittest.TestCase):
+    def setUp(self):
+        # Spans (start, end): first (102, 105), second (0, 10) and
+        # (300, 320), third (104, 150)
+        self.index = ErrorIndex.from_errors([
+            error('first', 2, 3, 5),
+            {'message': [
+                {'descr': 'second', 'line': 1, 'start': 1, 'end': 10},
+                {'descr': 'here', 'line': 4, 'start': 1, 'end': 20},
+            ]},
+            error('third', 2, 5, 50),
+        ], text_point)
+
+    def test_len_counts_errors_not_spans(self):
+        self.assertEqual(len(self.index), 3)
+
+    def test_spans_are_sorted_and_unique(self):
+        self.assertEqual(
+            self.index.spans(),
+            [(0, 10), (102, 105), (104, 150), (300, 320)]
+        )
+
+    def test_errors_at_point(self):
+        self.assertEqual(self.index.errors_at(5), [1])
+        self.assertEqual(self.index.errors_at(104), [0, 2])
+        self.assertEqual(self.index.errors_at(120), [2])
+        self.assertEqual(self.index.errors_at(200), [])
+
+    def test_errors_in_range_include_spans_starting_before_it(self):
+        # (104, 150) starts before the range and reaches into it
+        self.assertEqual(self.index.errors_in(140, 310), [1, 2])
+        self.assertEqual(self.index.errors_in(0, 1000), [0, 1, 2])
+
+    def test_describe(self):
+        self.assertEqual(
+            self.index.describe([1, 2]), 'second here; third'
+        )
+
+    def test_next_span_wraps_around(self):
+        self.assertEqual(self.index.next_span(0), (102, 105))
+        self.assertEqual(self.index.next_span(102), (104, 150))
+        self.assertEqual(self.index.next_span(300), (0, 10))
+
+    def test_previous_span_wraps_around(self):
+        self.assertEqual(self.index.previous_span(104), (102, 105))
+        self.assertEqual(self.index.previous_span(301), (300, 320))
+        self.assertEqual(self.index.previous_span(0), (300, 320))
+
+    def test_long_span_does_not_hide_later_errors(self):
+        # One error over the first 50 lines, then one on every line
+        index = ErrorIndex(
+            [(0, 5000, 0)] + [
+                (row * 100, row * 100 + 5, row + 1) for row in range(100)
+            ],
+            ['long'] + [str(row) for row in range(100)]
+        )
+        self.assertEqual(index.errors_at(1000), [0, 11])
+        self.assertEqual(index.errors_at(1050), [0])
+        self.assertEqual(index.errors_at(6002), [61])
+        self.assertEqual(index.errors_in(4990, 5100), [0, 51, 52])
+
+    def test_matches_a_linear_scan(self):
+        spans = [
+            (start, start + length, error_id)
+            for error_id, (start, length) in enumerate(
+                (i * 37 % 500, i * 53 % 120) for i in range(200)
+            )
+        ]
+        index = ErrorIndex(list(spans), [''] * len(spans))
+        for begin, end in [(0, 0), (10, 60), (250, 250), (480, 700)]:
+            self.assertEqual(index.errors_in(begin, end), sorted(
+                error_id for start, stop, error_id in spans
+                if start <= end and stop >= begin
+            ))
+
+    def test_empty_index(self):
+        index = ErrorIndex.from_errors([], text_point)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.errors_at(0), [])
+        self.assertIsNone(index.next_span(0))
+        self.assertIsNone(index.previous_span(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
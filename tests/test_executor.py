@@ -0,0 +1,236 @@
+import threading
+import unittest
+from concurrent.futures import Future
+
+from flowide.executor import (
+    PRIORITY_AUTOCOMPLETE,
+    PRIORITY_CHECK,
+    PRIORITY_COVERAGE,
+    PRIORITY_NAVIGATION,
+    QueryExecutor,
+    TooManyQueries,
+    chain_future,
+    completed_future
+)
+from flowide.scheduler import QueryCancelled, RequestScheduler
+
+
+ROOT = '/project'
+TIMEOUT = 5
+
+
+class QueryExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = QueryExecutor(concurrency=1)
+        self.started = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def job(self, name, release=None, started=None):
+        def run():
+            with self.lock:
+                self.started.append(name)
+            if started:
+                started.set()
+            if release:
+                release.wait(TIMEOUT)
+            return name
+        return run
+
+    def test_runs_highest_priority_first(self):
+        release = threading.Event()
+        started = threading.Event()
+        first = self.executor.submit(
+            PRIORITY_NAVIGATION, ROOT, self.job('first', release, started)
+        )
+        started.wait(TIMEOUT)
+        futures = [
+            self.executor.submit(priority, ROOT, self.job(name))
+            for priority, name in [
+                (PRIORITY_COVERAGE, 'coverage'),
+                (PRIORITY_CHECK, 'check'),
+                (PRIORITY_AUTOCOMPLETE, 'autocomplete'),
+            ]
+        ]
+        release.set()
+        for future in [first] + futures:
+            future.result(TIMEOUT)
+        self.assertEqual(
+            self.started, ['first', 'autocomplete', 'check', 'coverage']
+        )
+
+    def test_interactive_queries_run_beside_a_check_with_one_slot(self):
+        release = threading.Event()
+        started = threading.Event()
+        check = self.executor.submit(
+            PRIORITY_CHECK, ROOT, self.job('check', release, started)
+        )
+        started.wait(TIMEOUT)
+        coverage = self.executor.submit(
+            PRIORITY_COVERAGE, ROOT, self.job('coverage')
+        )
+        self.assertEqual(
+            self.executor.submit(
+                PRIORITY_AUTOCOMPLETE, ROOT, self.job('autocomplete')
+            ).result(TIMEOUT),
+            'autocomplete'
+        )
+        # The coverage query still waits for the check's slot
+        self.assertFalse(coverage.done())
+        release.set()
+        check.result(TIMEOUT)
+        coverage.result(TIMEOUT)
+        self.assertEqual(self.started, ['check', 'autocomplete', 'coverage'])
+
+    def test_one_interactive_query_at_a_time_with_one_slot(self):
+        release = threading.Event()
+        first = self.executor.submit(
+            PRIORITY_NAVIGATION, ROOT, self.job('first', release)
+        )
+        second = self.executor.submit(
+            PRIORITY_NAVIGATION, ROOT, self.job('second')
+        )
+        self.assertEqual(self.executor.pending(ROOT), 2)
+        self.assertFalse(second.done())
+        release.set()
+        self.assertEqual(second.result(TIMEOUT), 'second')
+        first.result(TIMEOUT)
+
+    def test_checks_leave_the_last_slot_free(self):
+        self.executor.set_concurrency(2)
+        release = threading.Event()
+        started = threading.Event()
+        checks = [
+            self.executor.submit(
+                PRIORITY_CHECK, ROOT, self.job(name, release, started)
+            )
+            for name in ('check', 'coverage')
+        ]
+        started.wait(TIMEOUT)
+        self.executor.submit(
+            PRIORITY_NAVIGATION, ROOT, self.job('navigation')
+        ).result(TIMEOUT)
+        # Only one of the checks holds a slot
+        self.assertEqual(len(self.started), 2)
+        self.assertIn('navigation', self.started)
+        release.set()
+        for future in checks:
+            future.result(TIMEOUT)
+
+    def test_roots_have_their_own_slots(self):
+        release = threading.Event()
+        blocked = self.executor.submit(
+            PRIORITY_CHECK, ROOT, self.job('check', release)
+        )
+        self.assertEqual(
+            self.executor.submit(
+                PRIORITY_CHECK, '/other', self.job('other')
+            ).result(TIMEOUT),
+            'other'
+        )
+        release.set()
+        blocked.result(TIMEOUT)
+
+    def test_cancelled_queries_are_dropped_before_they_start(self):
+        release = threading.Event()
+        scheduler = RequestScheduler()
+        blocked = self.executor.submit(
+            PRIORITY_CHECK, ROOT, self.job('check', release)
+        )
+        token = scheduler.begin((1, 'coverage'), 1)
+        cancelled = self.executor.submit(
+            PRIORITY_COVERAGE, ROOT, self.job('coverage'), token
+        )
+        scheduler.begin((1, 'coverage'), 2)
+        self.assertEqual(self.executor.pending(ROOT), 1)
+        release.set()
+        blocked.result(TIMEOUT)
+        with self.assertRaises(QueryCancelled):
+            cancelled.result(TIMEOUT)
+        self.assertEqual(self.started, ['check'])
+
+    def test_errors_settle_the_future(self):
+        def fail():
+            raise ValueError('bad output')
+        with self.assertRaises(ValueError):
+            self.executor.submit(PRIORITY_CHECK, ROOT, fail).result(TIMEOUT)
+
+    def test_shutdown_cancels_queued_queries(self):
+        release = threading.Event()
+        started = threading.Event()
+        blocked = self.executor.submit(
+            PRIORITY_CHECK, ROOT, self.job('check', release, started)
+        )
+        started.wait(TIMEOUT)
+        queued = self.executor.submit(
+            PRIORITY_COVERAGE, ROOT, self.job('coverage')
+        )
+        self.executor.shutdown()
+        release.set()
+        blocked.result(TIMEOUT)
+        with self.assertRaises(QueryCancelled):
+            queued.result(TIMEOUT)
+
+
+class FutureHelpersTest(unittest.TestCase):
+    def test_completed_future(self):
+        self.assertEqual(completed_future(1).result(0), 1)
+        with self.assertRaises(TooManyQueries):
+            completed_future(exception=TooManyQueries()).result(0)
+
+    def test_chain_future(self):
+        source = completed_future(exception=ValueError())
+        target = Future()
+        chain_future(source, target)
+        self.assertIsInstance(target.exception(0), ValueError)
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    def test_a_new_query_cancels_the_one_it_supersedes(self):
+        scheduler = RequestScheduler()
+        cancelled = []
+        first = scheduler.begin((1, 'check-contents'), 1)
+        first.on_cancel(lambda: cancelled.append('first'))
+        other = scheduler.begin((2, 'check-contents'), 1)
+        second = scheduler.begin((1, 'check-contents'), 2)
+
+        self.assertEqual(cancelled, ['first'])
+        self.assertTrue(first.cancelled)
+        self.assertFalse(other.cancelled)
+        self.assertFalse(scheduler.is_current(first))
+        self.assertTrue(scheduler.is_current(second))
+        with self.assertRaises(QueryCancelled):
+            first.raise_if_cancelled()
+
+    def test_cancellers_added_after_cancelling_run_at_once(self):
+        token = RequestScheduler().begin((1, 'coverage'), 1)
+        token.cancel()
+        cancelled = []
+        token.on_cancel(lambda: cancelled.append(True))
+        self.assertEqual(cancelled, [True])
+
+    def test_removed_cancellers_do_not_run(self):
+        token = RequestScheduler().begin((1, 'coverage'), 1)
+        cancelled = []
+
+        def canceller():
+            cancelled.append(True)
+        token.on_cancel(canceller)
+        token.remove_canceller(canceller)
+        token.cancel()
+        self.assertEqual(cancelled, [])
+
+    def test_finish_only_forgets_the_current_query(self):
+        scheduler = RequestScheduler()
+        first = scheduler.begin((1, 'coverage'), 1)
+        second = scheduler.begin((1, 'coverage'), 2)
+        scheduler.finish(first)
+        self.assertTrue(scheduler.is_current(second))
+        scheduler.finish(second)
+        self.assertFalse(scheduler.is_current(second))
+
+
+if __name__ == '__main__':
+    unittest.main()
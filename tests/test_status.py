@@ -0,0 +1,70 @@
+import json
+import unittest
+
+from flowide.status import StatusStreamParser, error_path
+
+
+ERRORS = [
+    {'message': [{'path': '/a.js', 'descr': 'café'}]},
+    {'message': [{'path': '', 'descr': 'x'}, {'path': '/b.js'}]},
+]
+OUTPUT = json.dumps({
+    'flowVersion': '0.100.0',
+    'errors': ERRORS,
+    'exit': {'code': 2},
+    'passed': False,
+    'timing': 1234,
+}, indent=1).encode('utf-8')
+
+
+def parse(chunks):
+    parser = StatusStreamParser()
+    errors = []
+    for chunk in chunks:
+        errors.extend(parser.feed(chunk))
+    return parser, errors
+
+
+class StatusStreamParserTest(unittest.TestCase):
+    def test_whole_output(self):
+        parser, errors = parse([OUTPUT])
+        self.assertEqual(errors, ERRORS)
+        self.assertEqual(parser.state, 'done')
+        self.assertEqual(parser.fields['exit'], {'code': 2})
+        self.assertEqual(parser.fields['timing'], 1234)
+        self.assertNotIn('errors', parser.fields)
+
+    def test_one_byte_at_a_time(self):
+        # Splits multi-byte characters, strings, keys and numbers
+        parser, errors = parse(
+            [OUTPUT[i:i + 1] for i in range(len(OUTPUT))]
+        )
+        self.assertEqual(errors, ERRORS)
+        self.assertEqual(parser.state, 'done')
+        self.assertEqual(parser.fields['timing'], 1234)
+        self.assertIs(parser.fields['passed'], False)
+
+    def test_errors_are_handed_out_as_they_complete(self):
+        parser = StatusStreamParser()
+        # Up to the start of the second error
+        first_end = OUTPUT.index(b'"message"', OUTPUT.index(b'caf'))
+        self.assertEqual(parser.feed(OUTPUT[:first_end]), ERRORS[:1])
+        self.assertEqual(parser.feed(OUTPUT[first_end:]), ERRORS[1:])
+
+    def test_truncated_output_is_not_done(self):
+        for end in (1, OUTPUT.index(b'errors'), len(OUTPUT) // 2,
+                    len(OUTPUT) - 1):
+            parser, _ = parse([OUTPUT[:end]])
+            self.assertNotEqual(parser.state, 'done', end)
+
+    def test_rejects_non_object_output(self):
+        with self.assertRaises(ValueError):
+            StatusStreamParser().feed(b'[]')
+
+    def test_error_path_skips_empty_paths(self):
+        self.assertEqual(error_path(ERRORS[1]), '/b.js')
+        self.assertIsNone(error_path({'message': []}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import shutil
+import tempfile
+import unittest
+
+from flowide.symbols import (
+    EXPORTED,
+    INDEX_VERSION,
+    SymbolIndex,
+    declarations,
+    imports
+)
+
+
+def identifier(name, line=1, column=0):
+    return {
+        'type': 'Identifier',
+        'name': name,
+        'loc': {'start': {'line': line, 'column': column}}
+    }
+
+
+def declaration(kind, name, line=1, column=0):
+    return {'type': kind, 'id': identifier(name, line, column)}
+
+
+PROGRAM = {'body': [
+    declaration('FunctionDeclaration', 'local', 1),
+    {'type': 'ExportNamedDeclaration',
+     'declaration': declaration('ClassDeclaration', 'Named', 2, 7)},
+    {'type': 'ExportDefaultDeclaration',
+     'declaration': declaration('FunctionDeclaration', 'main', 3, 15)},
+    {'type': 'VariableDeclaration', 'declarations': [
+        {'id': identifier('a', 4, 6)},
+        {'id': {'type': 'ObjectPattern'}},
+        {'id': identifier('b', 4, 13)},
+    ]},
+    {'type': 'ExportNamedDeclaration', 'declaration': None},
+    {'type': 'ExpressionStatement'},
+    {'type': 'ImportDeclaration', 'source': {'value': './util'},
+     'specifiers': [
+         {'type': 'ImportDefaultSpecifier', 'local': {'name': 'util'}},
+         {'type': 'ImportSpecifier', 'imported': {'name': 'parse'},
+          'local': {'name': 'parseIt'}},
+         {'type': 'ImportNamespaceSpecifier', 'local': {'name': 'all'}},
+     ]},
+]}
+
+
+class DeclarationsTest(unittest.TestCase):
+    def test_declarations(self):
+        self.assertEqual(declarations(PROGRAM), [
+            ['local', 'function', 1, 1, False],
+            ['Named', 'class', 2, 8, True],
+            ['main', 'function', 3, 16, 'default'],
+            ['a', 'variable', 4, 7, False],
+            ['b', 'variable', 4, 14, False],
+        ])
+
+    def test_imports(self):
+        self.assertEqual(imports(PROGRAM), [
+            ['util', 'default', './util'],
+            ['parseIt', 'parse', './util'],
+            ['all', '*', './util'],
+        ])
+
+    def test_empty_program(self):
+        self.assertEqual(declarations({}), [])
+        self.assertEqual(imports({}), [])
+
+
+class SymbolIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SymbolIndex('/project')
+        self.index.loaded = True
+        self.index.files = {
+            '/project/main.js': (1, [
+                ['helper', 'function', 1, 1, False],
+            ], [
+                ['util', 'default', './util'],
+                ['parseIt', 'parse', './util'],
+                ['missing', 'default', './missing'],
+                ['React', 'default', 'react'],
+            ]),
+            '/project/util/index.js': (1, [
+                ['run', 'function', 1, 1, 'default'],
+                ['parse', 'function', 5, 1, True],
+            ], []),
+            '/project/other.js': (1, [
+                ['parseIt', 'function', 1, 1, False],
+                ['helper', 'function', 2, 1, True],
+            ], []),
+        }
+
+    def test_resolve_module(self):
+        self.assertEqual(
+            self.index.resolve_module('/project/main.js', './util'),
+            '/project/util/index.js'
+        )
+        self.assertEqual(
+            self.index.resolve_module('/project/util/index.js', '../other'),
+            '/project/other.js'
+        )
+        self.assertIsNone(
+            self.index.resolve_module('/project/main.js', 'react')
+        )
+
+    def test_own_declaration_is_certain(self):
+        self.assertEqual(
+            self.index.definition_candidates('helper', '/project/main.js'),
+            ([('/project/main.js', ['helper', 'function', 1, 1, False])],
+             True)
+        )
+
+    def test_imports_resolve_to_the_export(self):
+        candidates = self.index.definition_candidates
+        self.assertEqual(
+            candidates('util', '/project/main.js'),
+            ([('/project/util/index.js',
+               ['run', 'function', 1, 1, 'default'])], True)
+        )
+        self.assertEqual(
+            candidates('parseIt', '/project/main.js'),
+            ([('/project/util/index.js',
+               ['parse', 'function', 5, 1, True])], True)
+        )
+
+    def test_unresolved_names_are_uncertain(self):
+        matches, certain = self.index.definition_candidates(
+            'parseIt', '/project/util/index.js'
+        )
+        self.assertFalse(certain)
+        self.assertEqual([path for path, _ in matches], ['/project/other.js'])
+
+        # Not resolved to an indexed module, so name matches elsewhere
+        # are only guesses
+        matches, certain = self.index.definition_candidates(
+            'missing', '/project/main.js'
+        )
+        self.assertEqual((matches, certain), ([], False))
+
+    def test_lookup_prefers_the_file_then_exports(self):
+        self.index.files['/project/util/index.js'][1].append(
+            ['helper', 'function', 9, 1, False]
+        )
+        matches = self.index.lookup('helper', '/project/util/index.js')
+        self.assertEqual([path for path, _ in matches], [
+            '/project/util/index.js',
+            '/project/other.js',
+            '/project/main.js',
+        ])
+        self.assertFalse(matches[0][1][EXPORTED])
+
+
+class SymbolIndexPersistenceTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_saved_index_is_loaded_by_a_new_instance(self):
+        index = SymbolIndex('/project', self.directory)
+        index.loaded = True
+        index.files['/project/a.js'] = (
+            1, [['a', 'function', 1, 1, True]], []
+        )
+        index.save()
+
+        reloaded = SymbolIndex('/project', self.directory)
+        self.assertEqual(
+            reloaded.symbols(),
+            [('/project/a.js', ['a', 'function', 1, 1, True])]
+        )
+        self.assertEqual(SymbolIndex('/other', self.directory).symbols(), [])
+
+    def test_other_versions_are_ignored(self):
+        index = SymbolIndex('/project', self.directory)
+        with open(index.path, 'w') as f:
+            f.write('{"version": %d, "files": {"/a.js": [1, [], []]}}'
+                    % (INDEX_VERSION - 1))
+        self.assertEqual(index.file_entry('/a.js'), (None, [], []))
+
+
+if __name__ == '__main__':
+    unittest.main()